@@ -0,0 +1,154 @@
+# backend/app/bench_giga.py
+import os, sys, time, json, random, asyncio, argparse, tempfile, tracemalloc, statistics
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+from backend.app.mock_giga import start_mock_server, SHAPES, OAUTH_PATH, CHAT_PATH
+
+# Сквозной бенчмарк: синтетические CSV/XLSX -> parse_table_with_giga и POST /upload
+# против локального mock GigaChat. Реальный API не нужен.
+#   python backend/app/bench_giga.py --sizes 100,1000 --latency-ms 50 --batch-size 10
+
+def make_table(path: Path, n_rows: int, seed: int = 0) -> Path:
+    """
+    Расписание с «чужими» заголовками (не из KEY_MAP), чтобы строки шли в LLM,
+    а не в локальный разбор. Строки уникальны — дедупликация их не схлопывает.
+    """
+    import pandas as pd
+    rnd = random.Random(seed)
+    subjects = ["Математика", "Физика", "История", "Программирование", "Английский язык"]
+    teachers = ["Иванов И.И.", "Петрова А.С.", "Сидоров П.П.", "Кузнецова Е.В."]
+    days = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница"]
+    times = ["08:30-10:00", "10:40-12:10", "13:00-14:30", "15:00-16:30"]
+    df = pd.DataFrame({
+        "Дисциплина (полное название)": [rnd.choice(subjects) for _ in range(n_rows)],
+        "Интервал": [rnd.choice(times) for _ in range(n_rows)],
+        "Ведущий": [rnd.choice(teachers) for _ in range(n_rows)],
+        "Место": [f"ауд. {100 + i}" for i in range(n_rows)],
+        "Д/н": [rnd.choice(days) for _ in range(n_rows)],
+    })
+    if path.suffix == ".csv":
+        df.to_csv(path, index=False)
+    else:
+        df.to_excel(path, index=False)
+    return path
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+def summarize(name: str, rows: int, timings: list[float], peak_bytes: int) -> dict:
+    total = sum(timings)
+    return {
+        "case": name,
+        "rows": rows,
+        "runs": len(timings),
+        "rows_per_s": round(rows * len(timings) / total, 1) if total else 0.0,
+        "p50_ms": round(percentile(timings, 50) * 1000, 1),
+        "p99_ms": round(percentile(timings, 99) * 1000, 1),
+        "mean_ms": round(statistics.fmean(timings) * 1000, 1),
+        "peak_mb": round(peak_bytes / 2**20, 2),
+    }
+
+async def timed(fn, repeat: int) -> tuple[list[float], int]:
+    """
+    repeat прогонов на время + один отдельный под tracemalloc (он сам тормозит).
+    """
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        await fn()
+        timings.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    await fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return timings, peak
+
+async def run(args, workdir: Path):
+    # env читается при импорте giga_client/parsers — импортируем только теперь
+    from backend.app import giga_client
+    from backend.app.parsers import parse_table_with_giga
+    from backend.app.main import app
+    import httpx
+
+    results = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as api:
+            for fmt in args.formats:
+                for n in args.sizes:
+                    path = make_table(workdir / f"bench_{n}.{fmt}", n)
+
+                    async def direct():
+                        res = await parse_table_with_giga(
+                            str(path), batch_size=args.batch_size, max_concurrency=args.concurrency,
+                            use_cache=False, dedup=False, local_bypass=False,
+                        )
+                        if res.get("status") != "ok":
+                            raise RuntimeError(res)
+
+                    async def upload():
+                        with open(path, "rb") as f:
+                            r = await api.post(
+                                "/upload",
+                                # incremental=false: иначе со второго повтора все строки берутся из прошлой версии
+                                params={"force": "true", "incremental": "false", "use_cache": "false", "dedup": "false",
+                                        "local_bypass": "false", "batch_size": args.batch_size},
+                                files={"file": (path.name, f)},
+                            )
+                        r.raise_for_status()
+
+                    for name, fn in (("parse", direct), ("upload", upload)):
+                        timings, peak = await timed(fn, args.repeat)
+                        results.append(summarize(f"{name}/{fmt}", n, timings, peak))
+                        print(json.dumps(results[-1], ensure_ascii=False), flush=True)
+    return results
+
+def main():
+    ap = argparse.ArgumentParser(description="GigaChat pipeline benchmark against a local mock")
+    ap.add_argument("--sizes", default="100,1000")
+    ap.add_argument("--formats", default="csv,xlsx")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--batch-size", type=int, default=10)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--latency-ms", type=float, default=20.0)
+    ap.add_argument("--jitter-ms", type=float, default=5.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--shape", choices=SHAPES, default="object")
+    ap.add_argument("--out", help="записать результаты в JSON")
+    args = ap.parse_args()
+    args.sizes = [int(s) for s in args.sizes.split(",") if s]
+    args.formats = [s.strip() for s in args.formats.split(",") if s.strip()]
+
+    server, cfg, url = start_mock_server(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, shape=args.shape, seed=0,
+    )
+    workdir = Path(tempfile.mkdtemp(prefix="bench_giga_"))
+    os.environ.update({
+        "GIGACHAT_OAUTH_URL": url + OAUTH_PATH,
+        "GIGACHAT_API_URL": url + CHAT_PATH,
+        "GIGACHAT_CLIENT_ID": "bench",
+        "GIGACHAT_CLIENT_SECRET": "bench",
+        "GIGACHAT_VERIFY_TLS": "false",
+        "GIGACHAT_RATE_LIMIT": "0",
+        "GIGACHAT_BACKOFF_BASE": "0.01",
+        "GIGACHAT_CACHE": "false",
+        "CAMPUS_DATA_DIR": str(workdir / "data"),
+    })
+    os.chdir(workdir)  # uploads/ создаётся относительно cwd
+
+    try:
+        results = asyncio.run(run(args, workdir))
+    finally:
+        server.shutdown()
+    print(f"mock calls: {cfg.counts}")
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+
+if __name__ == "__main__":
+    main()
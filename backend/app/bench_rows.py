@@ -0,0 +1,71 @@
+# backend/app/bench_rows.py
+import sys, time, random
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+import pandas as pd
+from backend.app.parsers import df_to_rows_with_context
+
+def df_to_rows_iterrows(df: pd.DataFrame, sheet_name: str) -> list[str]:
+    """
+    Прежняя построчная реализация (iterrows) — эталон для сравнения.
+    """
+    cols = [str(c).strip() for c in df.columns]
+    header_guess = ", ".join(cols[:12])
+    rows = []
+    for _, r in df.fillna("").iterrows():
+        parts = []
+        for col, val in zip(cols, r.values):
+            sval = str(val).strip()
+            if sval:
+                parts.append(f"{col}={sval}")
+        if parts:
+            rows.append(f"[Sheet: {sheet_name}] [Header: {header_guess}] row: " + " | ".join(parts))
+    return rows
+
+def make_df(n_rows: int, n_cols: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Синтетическая выгрузка: повторяющиеся значения, пробелы по краям, пустые ячейки.
+    """
+    rnd = random.Random(seed)
+    pool = ["Математика", " 09:00-10:30 ", "Иванов И.И.", "ауд. 101", "чётная", "", "  ", None, "-"]
+    data = {
+        f"Колонка {j}": [rnd.choice(pool) for _ in range(n_rows)]
+        for j in range(n_cols)
+    }
+    return pd.DataFrame(data, dtype=str)
+
+def bench(fn, df: pd.DataFrame, repeat: int) -> tuple[float, list[str]]:
+    best = float("inf")
+    out: list[str] = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(df, "Лист1")
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+def main():
+    """
+    rows/sec для df_to_rows_with_context до и после векторизации + проверка побайтного совпадения.
+    Запуск: python backend/app/bench_rows.py [строк] [колонок]
+    """
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    n_cols = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    df = make_df(n_rows, n_cols)
+
+    t_old, old = bench(df_to_rows_iterrows, df, repeat=1)
+    t_new, new = bench(df_to_rows_with_context, df, repeat=3)
+
+    if old != new:
+        print("РАСХОЖДЕНИЕ: вывод новой реализации отличается от эталона")
+        sys.exit(1)
+
+    print(f"{n_rows} строк x {n_cols} колонок, выход совпадает ({len(new)} строк)")
+    print(f"iterrows:   {t_old:8.3f} s  {n_rows / t_old:12.0f} rows/s")
+    print(f"vectorized: {t_new:8.3f} s  {n_rows / t_new:12.0f} rows/s")
+    print(f"ускорение:  x{t_old / t_new:.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# backend/app/bench_startup.py
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+from backend.app.mock_giga import start_mock_server, OAUTH_PATH, CHAT_PATH
+
+# Что меряем в свежем интерпретаторе: импорт приложения, старт lifespan
+# и первую загрузку маленькой таблицы (незнакомые заголовки -> запросы в модель)
+CHILD = r"""
+import sys, time, json, asyncio
+t0 = time.perf_counter()
+sys.path.insert(0, ROOT)
+from backend.app.main import app
+t_import = time.perf_counter() - t0
+pandas_at_import = "pandas" in sys.modules
+
+async def main():
+    import httpx
+    t1 = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        t_startup = time.perf_counter() - t1
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            t2 = time.perf_counter()
+            with open(TABLE, "rb") as f:
+                resp = await client.post("/upload", params={"force": "true", "incremental": "false"}, files={"file": ("start.csv", f)})
+            t_first = time.perf_counter() - t2
+    return t_startup, t_first, resp.status_code
+
+t_startup, t_first, status = asyncio.run(main())
+print(json.dumps({
+    "import": t_import,
+    "startup": t_startup,
+    "first_upload": t_first,
+    "status": status,
+    "pandas_at_import": pandas_at_import,
+}))
+"""
+
+def write_table(path: Path, n_rows: int) -> None:
+    lines = ["Дисциплина (полное название),Интервал,Ведущий,Место"]
+    lines += [f"Предмет {i},09:00-10:30,Преподаватель {i % 7},ауд. {100 + i % 9}" for i in range(n_rows)]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+def run_once(env: dict, table: Path, workdir: Path) -> dict:
+    code = f"ROOT = {str(ROOT)!r}\nTABLE = {str(table)!r}\n" + CHILD
+    out = subprocess.run(
+        [sys.executable, "-c", code], env=env, cwd=workdir,
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def import_profile(env: dict, workdir: Path, top: int) -> list[tuple[int, str]]:
+    """
+    Самые тяжёлые модули по -X importtime (кумулятивно, мкс).
+    """
+    code = f"import sys; sys.path.insert(0, {str(ROOT)!r}); import backend.app.main"
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], env=env, cwd=workdir,
+        capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        parts = line.removeprefix("import time:").split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+def main():
+    """
+    Холодный старт сервиса: медиана по свежим процессам, без прогрева и с STARTUP_WARMUP.
+    Запуск: python backend/app/bench_startup.py [--repeat 5] [--latency-ms 50] [--importtime 15]
+    """
+    ap = argparse.ArgumentParser(description="cold start benchmark")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--rows", type=int, default=5)
+    ap.add_argument("--latency-ms", type=float, default=50.0)
+    ap.add_argument("--importtime", type=int, default=0, help="показать N самых тяжёлых импортов")
+    args = ap.parse_args()
+
+    server, cfg, url = start_mock_server(latency_ms=args.latency_ms, seed=0)
+    workdir = Path(tempfile.mkdtemp(prefix="bench_startup_"))
+    table = workdir / "start.csv"
+    write_table(table, args.rows)
+    base_env = {
+        **os.environ,
+        "GIGACHAT_OAUTH_URL": url + OAUTH_PATH,
+        "GIGACHAT_API_URL": url + CHAT_PATH,
+        "GIGACHAT_CLIENT_ID": "bench",
+        "GIGACHAT_CLIENT_SECRET": "bench",
+        "GIGACHAT_VERIFY_TLS": "false",
+        "GIGACHAT_RATE_LIMIT": "0",
+        "GIGACHAT_CACHE": "false",
+        "CAMPUS_DATA_DIR": str(workdir / "data"),
+    }
+
+    try:
+        print(f"{args.repeat} запусков, первая загрузка: {args.rows} строк, задержка модели {args.latency_ms:.0f} ms")
+        print(f"{'':10} {'import':>10} {'startup':>10} {'1st upload':>12} {'total':>10}")
+        for label, warmup in (("cold", "false"), ("warm-up", "true")):
+            env = {**base_env, "STARTUP_WARMUP": warmup}
+            runs = [run_once(env, table, workdir) for _ in range(args.repeat)]
+            if any(r["status"] != 200 for r in runs):
+                print(f"{label}: загрузка не удалась: {[r['status'] for r in runs]}")
+                sys.exit(1)
+            med = {k: statistics.median(r[k] for r in runs) * 1000 for k in ("import", "startup", "first_upload")}
+            total = med["import"] + med["startup"] + med["first_upload"]
+            print(f"{label:10} {med['import']:8.0f}ms {med['startup']:8.0f}ms {med['first_upload']:10.0f}ms {total:8.0f}ms")
+        print(f"pandas загружен при импорте: {runs[0]['pandas_at_import']}")
+
+        if args.importtime:
+            print("\nтяжёлые импорты (кумулятивно):")
+            for us, name in import_profile(base_env, workdir, args.importtime):
+                print(f"{us / 1000:8.1f} ms  {name}")
+    finally:
+        server.shutdown()
+    print(f"mock calls: {cfg.counts}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# backend/app/column_mappings.py
+import json
+import time
+import hashlib
+import threading
+
+from .storage import connect
+
+# Выученные разметки колонок: заголовок листа -> {колонка: поле Lesson}
+MAPPING_FIELDS = {
+    "subject", "time", "start_time", "end_time", "teacher", "room",
+    "weekday", "date", "group", "subgroup", "week_type", "note",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS column_mappings (
+    header_key TEXT PRIMARY KEY,
+    columns    TEXT NOT NULL,
+    mapping    TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    used_at    REAL NOT NULL,
+    uses       INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+_lock = threading.Lock()
+
+
+def _db():
+    return connect("column_mappings.sqlite3", _SCHEMA)
+
+
+def header_key(columns: list[str]) -> str:
+    """
+    Ключ заголовка: регистр и пробелы по краям не важны, порядок колонок важен.
+    """
+    norm = [str(c).strip().lower() for c in columns]
+    return hashlib.sha256(json.dumps(norm, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def clean_mapping(columns: list[str], raw: object) -> dict[str, str]:
+    """
+    Ответ модели -> {колонка: поле} только для известных колонок и полей.
+    """
+    if not isinstance(raw, dict):
+        return {}
+    by_lower = {str(c).strip().lower(): c for c in columns}
+    mapping = {}
+    for k, v in raw.items():
+        col = by_lower.get(str(k).strip().lower())
+        field = str(v or "").strip().lower()
+        if col is not None and field in MAPPING_FIELDS:
+            mapping[col] = field
+    return mapping
+
+
+def get_mapping(columns: list[str]) -> dict[str, str] | None:
+    key = header_key(columns)
+    with _lock:
+        db = _db()
+        row = db.execute("SELECT mapping FROM column_mappings WHERE header_key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        db.execute(
+            "UPDATE column_mappings SET used_at = ?, uses = uses + 1 WHERE header_key = ?",
+            (time.time(), key),
+        )
+        db.commit()
+    return json.loads(row[0])
+
+
+def put_mapping(columns: list[str], mapping: dict[str, str]) -> None:
+    now = time.time()
+    with _lock:
+        db = _db()
+        db.execute(
+            "INSERT OR REPLACE INTO column_mappings (header_key, columns, mapping, created_at, used_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                header_key(columns),
+                json.dumps(columns, ensure_ascii=False),
+                json.dumps(mapping, ensure_ascii=False),
+                now,
+                now,
+            ),
+        )
+        db.commit()
+
+
+def delete_mapping(columns: list[str]) -> bool:
+    with _lock:
+        db = _db()
+        n = db.execute("DELETE FROM column_mappings WHERE header_key = ?", (header_key(columns),)).rowcount
+        db.commit()
+    return n > 0
@@ -0,0 +1,198 @@
+# backend/app/conflicts.py
+import os
+import heapq
+from bisect import bisect_right
+from collections import defaultdict
+from functools import lru_cache
+from typing import Iterator
+
+from .mappings import PAIR_START_TIMES
+from .mappings import weekday_number, week_parity
+
+# Накладки по аудиториям, преподавателям и группам в разобранных расписаниях
+PAIR_DURATION_MIN = int(os.getenv("PAIR_DURATION_MINUTES", "90"))
+# больше накладок не перечисляем: это уже не расписание, а поломанный файл
+MAX_CONFLICTS = int(os.getenv("MAX_CONFLICTS", "10000"))
+
+KINDS = ("room", "teacher", "group")
+# ключи урока в resources: ресурсы (как KINDS), затем то, что нужно _joint
+_FIELDS = (*KINDS, "subject", "subgroup")
+_ROOM, _TEACHER, _GROUP, _SUBJECT, _SUBGROUP = range(len(_FIELDS))
+
+
+def _minutes(value) -> int | None:
+    s = str(value or "").strip()
+    h, sep, m = s.partition(":")
+    if not sep or not h.isdigit() or not m.isdigit():
+        return None
+    return int(h) * 60 + int(m)
+
+
+_PAIR_STARTS = sorted(m for m in map(_minutes, PAIR_START_TIMES) if m is not None)
+
+
+def pair_number(start: int) -> int:
+    """
+    Номер пары (с 1) по сетке PAIR_START_TIMES: последняя пара, начавшаяся не позже start.
+    0 — раньше первой пары.
+    """
+    return bisect_right(_PAIR_STARTS, start)
+
+
+def lesson_interval(start_time, end_time) -> tuple[int, int] | None:
+    """
+    (начало, конец) в минутах. Нет конца — берём начало пары по сетке + длительность пары.
+    """
+    start = _minutes(start_time)
+    if start is None:
+        return None
+    end = _minutes(end_time)
+    if end is None or end <= start:
+        n = pair_number(start)
+        base = _PAIR_STARTS[n - 1] if n else start
+        end = max(base + PAIR_DURATION_MIN, start + 1)
+    return start, end
+
+
+@lru_cache(maxsize=None)
+def _hhmm(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _key(value) -> str:
+    return str(value or "").strip().lower()
+
+
+def _joint(kind: str, a: tuple[str, ...], b: tuple[str, ...]) -> bool:
+    """
+    Не накладка, а одно занятие: поточная лекция (та же дисциплина и тот же преподаватель
+    или аудитория) или разные подгруппы одной группы. a, b — нормализованные ключи урока (_FIELDS).
+    """
+    if kind == "group":
+        sa, sb = a[_SUBGROUP], b[_SUBGROUP]
+        if sa and sb and sa != sb:
+            return True
+    if a[_SUBJECT] != b[_SUBJECT]:
+        return False
+    if kind == "room":
+        return a[_TEACHER] == b[_TEACHER]
+    if kind == "teacher":
+        return a[_ROOM] == b[_ROOM]
+    return a[_TEACHER] == b[_TEACHER] and a[_ROOM] == b[_ROOM]
+
+
+def _buckets(lessons: list[dict]) -> tuple[dict[tuple, list[tuple[int, int, int]]], dict[int, tuple[str, ...]]]:
+    """
+    (день, тип недели) -> [(начало, конец, номер урока)] и нормализованные ключи урока (_FIELDS).
+    День — дата, если есть, иначе номер дня недели. Урок без чётности недели идёт каждую
+    неделю, поэтому попадает во все типизированные корзины своего дня.
+    Значения в расписании сильно повторяются — нормализуем каждое один раз.
+    """
+    keys_memo: dict = {}
+    weekday_memo: dict = {}
+    parity_memo: dict = {}
+    intervals: dict[tuple, tuple[int, int] | None] = {}
+
+    def key(value) -> str:
+        k = keys_memo.get(value)
+        if k is None:
+            k = keys_memo[value] = _key(value)
+        return k
+
+    by_day: dict[tuple, list[tuple[str, tuple[int, int, int]]]] = defaultdict(list)
+    resources: dict[int, tuple[str, ...]] = {}
+    for i, obj in enumerate(lessons):
+        if "error" in obj:
+            continue
+        times = (obj.get("start_time") or "", obj.get("end_time") or "")
+        span = intervals.get(times, False)
+        if span is False:
+            span = intervals[times] = lesson_interval(*times)
+        if span is None:
+            continue
+        date = obj.get("date")
+        if date and str(date).strip():
+            day = ("date", str(date).strip())
+        else:
+            weekday = obj.get("weekday") or ""
+            n = weekday_memo.get(weekday)
+            if n is None:
+                n = weekday_memo[weekday] = weekday_number(weekday)
+            if not n:
+                continue
+            day = ("weekday", n)
+        # "чётная", "Неч." — тоже чётность; всё прочее ("1-16") считаем «каждую неделю»
+        week_type = obj.get("week_type") or ""
+        parity = parity_memo.get(week_type)
+        if parity is None:
+            parity = parity_memo[week_type] = week_parity(week_type)
+        by_day[day].append((parity, (span[0], span[1], i)))
+        resources[i] = tuple([key(obj.get(name)) for name in _FIELDS])
+
+    buckets: dict[tuple, list[tuple[int, int, int]]] = defaultdict(list)
+    for day, items in by_day.items():
+        typed = {wt for wt, _ in items if wt}
+        for wt, item in items:
+            for target in ([wt] if wt else (typed or [""])):
+                buckets[(day, target)].append(item)
+    return buckets, resources
+
+
+def _overlaps(lessons: list[dict], buckets: dict, resources: dict, kind: str, seen: set) -> Iterator[dict]:
+    """
+    seen — уже найденные пары (день, i, j): урок без чётности сидит в двух корзинах,
+    и повторную пару отбрасываем до того, как строить для неё запись.
+    """
+    slot = KINDS.index(kind)
+    for (day, week_type), items in buckets.items():
+        by_resource: dict[str, list[tuple[int, int, int]]] = defaultdict(list)
+        for item in items:
+            resource = resources[item[2]][slot]
+            if resource:
+                by_resource[resource].append(item)
+
+        for resource, spans in by_resource.items():
+            if len(spans) < 2:
+                continue
+            spans.sort()
+            # sweep: в куче — занятия, которые ещё идут к началу текущего
+            active: list[tuple[int, int, int]] = []  # (конец, начало, урок)
+            for start, end, i in spans:
+                while active and active[0][0] <= start:
+                    heapq.heappop(active)
+                for other_end, _, j in active:
+                    pair = (day, j, i) if j < i else (day, i, j)
+                    if pair in seen or _joint(kind, resources[j], resources[i]):
+                        continue
+                    seen.add(pair)
+                    yield {
+                        "kind": kind,
+                        "resource": lessons[i].get(kind),
+                        "day": day[1],
+                        "week_type": week_type,
+                        "lessons": [pair[1], pair[2]],
+                        "overlap": [_hhmm(start), _hhmm(min(end, other_end))],
+                    }
+                heapq.heappush(active, (end, start, i))
+
+
+def detect_conflicts(lessons: list[dict], kinds: tuple[str, ...] = KINDS) -> dict:
+    """
+    Накладки внутри одного ресурса (аудитория / преподаватель / группа):
+    корзины по дню и типу недели, в каждой — sweep по интервалам (start_time, end_time).
+    Возвращает {"count", "truncated", "conflicts"}; накладка —
+      {"kind", "resource", "day", "week_type", "lessons": [i, j], "overlap": [с, по]},
+    где i, j — номера уроков во входном списке.
+    """
+    buckets, resources = _buckets(lessons)
+    conflicts: list[dict] = []
+    truncated = False
+    for kind in kinds:
+        for conflict in _overlaps(lessons, buckets, resources, kind, set()):
+            if len(conflicts) >= MAX_CONFLICTS:
+                truncated = True
+                break
+            conflicts.append(conflict)
+        if truncated:
+            break
+    return {"count": len(conflicts), "truncated": truncated, "conflicts": conflicts}
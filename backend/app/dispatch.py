@@ -0,0 +1,60 @@
+# backend/app/dispatch.py
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Hashable
+
+
+class FairDispatcher:
+    """
+    Общий бюджет параллельных запросов к GigaChat на несколько файлов сразу.
+    Как asyncio.Semaphore(limit), но освободившийся слот достаётся владельцам
+    (файлам) по кругу: большой файл не занимает все слоты, пока маленькие ждут.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.active = 0
+        self._waiters: OrderedDict[Hashable, deque[asyncio.Future]] = OrderedDict()
+        self.granted: dict[Hashable, int] = {}
+
+    def _wake_next(self) -> None:
+        while self._waiters and self.active < self.limit:
+            owner, queue = next(iter(self._waiters.items()))
+            fut = queue.popleft()
+            if queue:
+                # владелец уходит в конец круга
+                self._waiters.move_to_end(owner)
+            else:
+                del self._waiters[owner]
+            if fut.done():
+                continue  # ожидание отменили
+            self.active += 1
+            fut.set_result(None)
+
+    async def acquire(self, owner: Hashable) -> None:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+        else:
+            fut = asyncio.get_running_loop().create_future()
+            self._waiters.setdefault(owner, deque()).append(fut)
+            try:
+                await fut
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled():
+                    # слот уже выдан, а нас отменили — возвращаем его
+                    self.release()
+                raise
+        self.granted[owner] = self.granted.get(owner, 0) + 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._wake_next()
+
+    @asynccontextmanager
+    async def slot(self, owner: Hashable):
+        await self.acquire(owner)
+        try:
+            yield
+        finally:
+            self.release()
@@ -1,12 +1,32 @@
 # backend/app/giga_client.py
 import os
+import json
+import time
+import asyncio
 import httpx
 from dotenv import load_dotenv
 import base64
 import uuid
+import importlib.util
 
+# .env и настройки из окружения читаются один раз, при импорте, а не в lifespan:
+# на них завязаны константы уровня модулей (здесь, в parsers, resilience, llm_cache),
+# а сам load_dotenv стоит ~10 ms. Lifespan отвечает за каталоги, клиент и прогрев.
 load_dotenv()
 
+# после load_dotenv: модуль читает свои настройки из окружения при импорте
+from .resilience import (
+    CircuitOpenError,
+    RETRY_STATUSES,
+    MAX_RETRIES,
+    breaker,
+    rate_limiter,
+    backoff_delay,
+    retry_after_seconds,
+    record_gave_up,
+)
+from .metrics import record_llm_request, record_usage
+
 CLIENT_ID = os.getenv("GIGACHAT_CLIENT_ID")
 CLIENT_SECRET = os.getenv("GIGACHAT_CLIENT_SECRET")
 SCOPE = os.getenv("GIGACHAT_SCOPE", "GIGACHAT_API_PERS")
@@ -16,9 +36,118 @@ API_URL = os.getenv("GIGACHAT_API_URL", "https://gigachat.devices.sberbank.ru/ap
 VERIFY_TLS = os.getenv("GIGACHAT_VERIFY_TLS", "false").lower() in ("1", "true", "yes")
 TIMEOUT_S  = float(os.getenv("GIGACHAT_TIMEOUT", "30.0"))
 
+# сколько строк одновременно отправляем в модель (in-flight запросы)
+MAX_CONCURRENCY = max(1, int(os.getenv("GIGACHAT_MAX_CONCURRENCY", "8")))
+# сколько строк упаковывать в один запрос (1 — по строке на запрос, как раньше)
+BATCH_SIZE = max(1, int(os.getenv("GIGACHAT_BATCH_SIZE", "1")))
 
+# пул соединений общего клиента
+POOL_MAX_CONNECTIONS = int(os.getenv("GIGACHAT_POOL_MAX_CONNECTIONS", "20"))
+POOL_MAX_KEEPALIVE   = int(os.getenv("GIGACHAT_POOL_MAX_KEEPALIVE", "10"))
+KEEPALIVE_EXPIRY_S   = float(os.getenv("GIGACHAT_KEEPALIVE_EXPIRY", "60.0"))
+# HTTP/2 включаем только если установлен пакет h2 (pip install httpx[http2])
+HTTP2 = (
+    os.getenv("GIGACHAT_HTTP2", "false").lower() in ("1", "true", "yes")
+    and importlib.util.find_spec("h2") is not None
+)
 
-async def get_gigachat_token() -> str:
+# токен обновляем заранее, за столько секунд до истечения
+TOKEN_REFRESH_MARGIN_S = float(os.getenv("GIGACHAT_TOKEN_REFRESH_MARGIN", "60"))
+# если OAuth не вернул срок жизни — по доке токен живёт 30 минут
+TOKEN_DEFAULT_TTL_S = 30 * 60
+
+_client: httpx.AsyncClient | None = None
+
+# кэш access_token на весь процесс
+_token: str | None = None
+_token_refresh_at: float = 0.0      # unix-время (сек), после которого идём за новым
+_token_lock: asyncio.Lock | None = None
+_token_lock_loop: asyncio.AbstractEventLoop | None = None
+
+
+async def init_http_client() -> httpx.AsyncClient:
+    """
+    Создаёт общий долгоживущий клиент (keep-alive + пул соединений).
+    Вызывается на старте приложения; повторный вызов вернёт тот же клиент.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            verify=VERIFY_TLS,
+            timeout=TIMEOUT_S,
+            http2=HTTP2,
+            limits=httpx.Limits(
+                max_connections=POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=POOL_MAX_KEEPALIVE,
+                keepalive_expiry=KEEPALIVE_EXPIRY_S,
+            ),
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    """
+    Закрывает общий клиент (на остановке приложения).
+    """
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def get_http_client() -> httpx.AsyncClient:
+    """
+    Общий клиент; если приложение его не подняло (скрипты, тесты) — создаём лениво.
+    """
+    if _client is None or _client.is_closed:
+        return await init_http_client()
+    return _client
+
+
+
+def _token_expiry_from_response(j: dict) -> float:
+    """
+    Срок жизни токена из ответа OAuth:
+    expires_at (мс или сек с эпохи) или expires_in (сек). Иначе — дефолт.
+    """
+    now = time.time()
+    expires_at = j.get("expires_at")
+    if isinstance(expires_at, (int, float)) and expires_at > 0:
+        # GigaChat отдаёт миллисекунды
+        return expires_at / 1000.0 if expires_at > 1e11 else float(expires_at)
+    expires_in = j.get("expires_in")
+    if isinstance(expires_in, (int, float)) and expires_in > 0:
+        return now + float(expires_in)
+    return now + TOKEN_DEFAULT_TTL_S
+
+
+def _get_token_lock() -> asyncio.Lock:
+    # Lock привязан к event loop — скрипты с несколькими asyncio.run() получают свой
+    global _token_lock, _token_lock_loop
+    loop = asyncio.get_running_loop()
+    if _token_lock is None or _token_lock_loop is not loop:
+        _token_lock = asyncio.Lock()
+        _token_lock_loop = loop
+    return _token_lock
+
+
+def _token_is_fresh() -> bool:
+    return _token is not None and time.time() < _token_refresh_at
+
+
+def invalidate_gigachat_token(token: str | None = None) -> None:
+    """
+    Сбрасывает закэшированный токен (например, после 401).
+    Если передан token — сбрасываем, только если в кэше всё ещё он,
+    чтобы не выкинуть уже обновлённый другим запросом.
+    """
+    global _token, _token_refresh_at
+    if token is None or token == _token:
+        _token = None
+        _token_refresh_at = 0.0
+
+
+async def _fetch_gigachat_token() -> tuple[str, float]:
     """
     Получаем access_token по документации.
     Бросаем исключение при любом не-200 ответе.
@@ -38,56 +167,225 @@ async def get_gigachat_token() -> str:
     }
     data = {"scope": SCOPE}
     
-    async with httpx.AsyncClient(verify=VERIFY_TLS, timeout=TIMEOUT_S) as client:
-        resp = await client.post(OAUTH_URL, headers=headers, data=data)
-        resp.raise_for_status()            # <— важный момент: сразу фейлим по коду
-        j = resp.json()
-        token = j.get("access_token")
-        if not token:
-            raise RuntimeError(f"No access_token in response: {j}")
-        return token
+    client = await get_http_client()
+    resp = await client.post(OAUTH_URL, headers=headers, data=data)
+    resp.raise_for_status()            # <— важный момент: сразу фейлим по коду
+    j = resp.json()
+    token = j.get("access_token")
+    if not token:
+        raise RuntimeError(f"No access_token in response: {j}")
+    return token, _token_expiry_from_response(j)
 
 
-async def ask_gigachat_single(prompt: str, token: str, api_url: str) -> dict:
-     
+async def get_gigachat_token() -> str:
     """
-    Отправляет ОДНУ строку в чат-модель. Возвращает resp.json() как dict.
+    access_token из общего кэша процесса.
+    Обновляется заранее (GIGACHAT_TOKEN_REFRESH_MARGIN сек до истечения);
+    параллельные загрузки ждут один и тот же запрос к OAuth.
+    """
+    global _token, _token_refresh_at
+    if _token_is_fresh():
+        return _token
+
+    async with _get_token_lock():
+        # пока ждали lock, токен мог обновить другой запрос
+        if _token_is_fresh():
+            return _token
+        token, expires_at = await _fetch_gigachat_token()
+        ttl = max(0.0, expires_at - time.time())
+        # для коротких токенов запас не больше половины срока жизни
+        _token_refresh_at = expires_at - min(TOKEN_REFRESH_MARGIN_S, ttl / 2)
+        _token = token
+        return _token
+
+
+async def warm_up() -> dict:
+    """
+    Прогрев перед приёмом запросов: токен в кэш и одно открытое соединение
+    к API в пуле (запрос списка моделей — ответ неважен, важен handshake).
+    Ошибки не фатальны: сервис стартует, токен возьмёт первая загрузка.
+    """
+    status = {"token": False, "connection": False}
+    if not CLIENT_ID or not CLIENT_SECRET:
+        status["error"] = "GIGACHAT_CLIENT_ID/GIGACHAT_CLIENT_SECRET не заданы"
+        return status
+    try:
+        token = await get_gigachat_token()
+        status["token"] = True
+        client = await get_http_client()
+        models_url = API_URL.rsplit("/chat/completions", 1)[0] + "/models"
+        await client.get(models_url, headers={"Authorization": f"Bearer {token}"})
+        status["connection"] = True
+    except Exception as e:
+        status["error"] = str(e) or type(e).__name__
+    return status
+
+
+# Строгий system prompt для одной строки
+DEFAULT_SYSTEM_PROMPT = (
+    "Ты — парсер учебного расписания."
+    "Вход: ОДНА строка в формате:"
+    "[Sheet: <название листа>] [Header: <список колонок через запятую>] row: <col>=<value> | <col2>=<value2> | ..."
+    "Колонки и значения могут быть на русском или английском, с любыми названиями."
+    "Нужно вернуть ОДИН JSON-объект с СТРОГИМИ ключами:"
+    "subject, start_time, end_time, teacher, room, weekday, date, group, subgroup, week_type, note."
+    "Правила:"
+    "Если время дано диапазоном (например ""9:00-10:30"", ""9.00 до 10.30"") — заполни start_time и end_time."
+    "Если указано одно время — положи его в start_time, end_time оставь пустым."
+    "Если есть и день недели, и дата — заполни оба поля."
+    "Все значения — строки (можно пустые)."
+    "Если чего-то нет в строке — оставь пустую строку."
+    "НЕ добавляй новых ключей."
+    "Отвечай ТОЛЬКО валидным JSON-объектом без текста вокруг и без ```."
+)
+
+# То же самое, но для пачки строк: на выходе JSON-массив той же длины
+DEFAULT_BATCH_SYSTEM_PROMPT = (
+    "Ты — парсер учебного расписания."
+    "Вход: НЕСКОЛЬКО строк, каждая с номером, в формате:"
+    "<N>. [Sheet: <название листа>] [Header: <список колонок через запятую>] row: <col>=<value> | <col2>=<value2> | ..."
+    "Колонки и значения могут быть на русском или английском, с любыми названиями."
+    "Для КАЖДОЙ строки нужен JSON-объект с СТРОГИМИ ключами:"
+    "subject, start_time, end_time, teacher, room, weekday, date, group, subgroup, week_type, note."
+    "Правила:"
+    "Если время дано диапазоном (например ""9:00-10:30"", ""9.00 до 10.30"") — заполни start_time и end_time."
+    "Если указано одно время — положи его в start_time, end_time оставь пустым."
+    "Если есть и день недели, и дата — заполни оба поля."
+    "Все значения — строки (можно пустые)."
+    "Если чего-то нет в строке — оставь пустую строку."
+    "НЕ добавляй новых ключей."
+    "Верни JSON-массив, где i-й объект соответствует строке с номером i; длина массива = числу строк."
+    "Отвечай ТОЛЬКО валидным JSON-массивом без текста вокруг и без ```."
+)
+
+# Разметка колонок листа: один запрос на заголовок вместо запроса на строку
+DEFAULT_COLUMNS_SYSTEM_PROMPT = (
+    "Ты — помощник по разбору учебного расписания."
+    "Вход: название листа, список колонок таблицы и несколько примеров строк."
+    "Для КАЖДОЙ колонки определи, какое поле расписания в ней лежит:"
+    "subject, time, start_time, end_time, teacher, room, weekday, date, group, subgroup, week_type, note."
+    "time — если в колонке диапазон времени целиком (например ""9:00-10:30"")."
+    "Если колонка не подходит ни к одному полю — поставь пустую строку."
+    "Верни ОДИН JSON-объект: ключи — названия колонок РОВНО как во входе, значения — поле или пустая строка."
+    "Отвечай ТОЛЬКО валидным JSON-объектом без текста вокруг и без ```."
+)
+
+
+def get_system_prompt() -> str:
+    # по умолчанию из ENV, иначе дефолт
+    return os.getenv("GIGACHAT_SYSTEM_PROMPT", DEFAULT_SYSTEM_PROMPT)
+
+
+def get_batch_system_prompt() -> str:
+    return os.getenv("GIGACHAT_BATCH_SYSTEM_PROMPT", DEFAULT_BATCH_SYSTEM_PROMPT)
+
+
+def get_columns_system_prompt() -> str:
+    return os.getenv("GIGACHAT_COLUMNS_SYSTEM_PROMPT", DEFAULT_COLUMNS_SYSTEM_PROMPT)
+
+
+def get_model() -> str:
+    return os.getenv("GIGACHAT_MODEL", "GigaChat-2")
+
+
+async def _post_chat(system_prompt: str, user_content: str, token: str, api_url: str, kind: str = "chat") -> dict:
+    """
+    Один chat/completions запрос. На 401 обновляем токен и повторяем один раз.
+    Перед отправкой — общий rate limiter; на 429/5xx/сетевые ошибки — повторы
+    с экспоненциальной паузой (или Retry-After). Пока API нездоров (circuit breaker
+    открыт) — сразу CircuitOpenError, без запроса.
+    Каждая попытка попадает в метрики с меткой kind (single / batch / columns).
     """
-     
     headers = {
         "Authorization": f"Bearer {token}",
         "Content-Type": "application/json",
         "Accept": "application/json",
     }
 
-    # Строгий system prompt — по умолчанию из ENV, иначе дефолт
-    system_prompt = os.getenv("GIGACHAT_SYSTEM_PROMPT",
-        "Ты — парсер учебного расписания."
-        "Вход: ОДНА строка в формате:"
-        "[Sheet: <название листа>] [Header: <список колонок через запятую>] row: <col>=<value> | <col2>=<value2> | ..."
-        "Колонки и значения могут быть на русском или английском, с любыми названиями."
-        "Нужно вернуть ОДИН JSON-объект с СТРОГИМИ ключами:"
-        "subject, start_time, end_time, teacher, room, weekday, date, group, subgroup, week_type, note."
-        "Правила:"
-        "Если время дано диапазоном (например ""9:00-10:30"", ""9.00 до 10.30"") — заполни start_time и end_time."
-        "Если указано одно время — положи его в start_time, end_time оставь пустым."
-        "Если есть и день недели, и дата — заполни оба поля."
-        "Все значения — строки (можно пустые)."
-        "Если чего-то нет в строке — оставь пустую строку."
-        "НЕ добавляй новых ключей."
-        "Отвечай ТОЛЬКО валидным JSON-объектом без текста вокруг и без ```."
-    )
-    
     body = {
-        "model": os.getenv("GIGACHAT_MODEL", "GigaChat-2"), 
+        "model": get_model(),
         "messages": [
             {"role": "system", "content": system_prompt},
-            {"role": "user", "content": prompt}
+            {"role": "user", "content": user_content}
         ],
         "temperature": 0.0,
     }
 
-    async with httpx.AsyncClient(verify=VERIFY_TLS, timeout=TIMEOUT_S) as client:
-        resp = await client.post(api_url, headers=headers, json=body)
-        resp.raise_for_status()
-        return resp.json()
+    client = await get_http_client()
+    refreshed = False
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise CircuitOpenError("GigaChat circuit breaker is open")
+        settled = False
+        try:
+            await rate_limiter.acquire()
+            t0 = time.perf_counter()
+            try:
+                resp = await client.post(api_url, headers=headers, json=body)
+                error = None
+            except httpx.TransportError as e:
+                resp, error = None, e
+            record_llm_request(
+                kind,
+                str(resp.status_code) if resp is not None else "transport_error",
+                time.perf_counter() - t0,
+            )
+
+            if resp is not None and resp.status_code not in RETRY_STATUSES:
+                # API отвечает — даже 4xx не повод считать его нездоровым
+                breaker.record_success()
+                settled = True
+                if resp.status_code == 401 and not refreshed:
+                    # токен отозван/протух раньше срока — берём новый и повторяем один раз
+                    invalidate_gigachat_token(token)
+                    headers["Authorization"] = f"Bearer {await get_gigachat_token()}"
+                    refreshed = True
+                    continue
+                resp.raise_for_status()
+                data = resp.json()
+                record_usage(data.get("usage") if isinstance(data, dict) else None)
+                return data
+
+            if attempt >= MAX_RETRIES:
+                breaker.record_failure()
+                settled = True
+                record_gave_up()
+                if error is not None:
+                    raise error
+                resp.raise_for_status()
+        finally:
+            if not settled:
+                breaker.abandon()
+
+        retry_after = retry_after_seconds(resp.headers.get("Retry-After")) if resp is not None else None
+        await asyncio.sleep(backoff_delay(attempt, retry_after))
+        attempt += 1
+
+
+async def ask_gigachat_single(prompt: str, token: str, api_url: str) -> dict:
+     
+    """
+    Отправляет ОДНУ строку в чат-модель. Возвращает resp.json() как dict.
+    """
+
+    return await _post_chat(get_system_prompt(), prompt, token, api_url, kind="single")
+
+
+async def ask_gigachat_batch(prompts: list[str], token: str, api_url: str) -> dict:
+    """
+    Отправляет НЕСКОЛЬКО строк одним запросом (system prompt — один на пачку).
+    Модель должна вернуть JSON-массив по строке на элемент. Возвращает resp.json().
+    """
+    user_content = "\n".join(f"{i}. {p}" for i, p in enumerate(prompts, start=1))
+    return await _post_chat(get_batch_system_prompt(), user_content, token, api_url, kind="batch")
+
+
+async def ask_gigachat_columns(sheet: str, columns: list[str], samples: list[str], token: str, api_url: str) -> dict:
+    """
+    Один запрос на заголовок листа: какая колонка — какое поле Lesson.
+    Модель должна вернуть JSON-объект {колонка: поле}. Возвращает resp.json().
+    """
+    lines = [f"Sheet: {sheet}", "Columns: " + json.dumps(columns, ensure_ascii=False)]
+    lines += [f"Example: {row}" for row in samples]
+    return await _post_chat(get_columns_system_prompt(), "\n".join(lines), token, api_url, kind="columns")
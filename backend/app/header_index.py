@@ -0,0 +1,152 @@
+# backend/app/header_index.py
+import os
+import re
+from collections import defaultdict
+from functools import lru_cache
+
+from .mappings import KEY_MAP
+
+# Нечёткое сопоставление заголовков колонок с полями урока по KEY_MAP.
+# "Преподаватель:", "ФИО  преподавателя", "Ауд", "Time (start)" раскладываются
+# локально, без запроса к модели. Индекс строится один раз при импорте.
+
+# ниже этой уверенности заголовок считаем незнакомым (1.0 — только точные совпадения после нормализации)
+MATCH_THRESHOLD = float(os.getenv("HEADER_MATCH_THRESHOLD", "0.8"))
+# каждое слово заголовка должно найтись в синониме хотя бы с такой похожестью:
+# "ФИО студента" — не "ФИО", "Место работы" — не "Место"
+TOKEN_THRESHOLD = 0.75
+# лучший и второй кандидат с разными полями ближе этого — заголовок неоднозначен
+AMBIGUITY_MARGIN = 0.05
+# сколько разных заголовков помним
+CACHE_SIZE = 4096
+
+_PUNCT_RE = re.compile(r"[^\w]+|_")
+_MIN_PREFIX = 3
+
+
+def normalize_header(value) -> str:
+    """
+    Нижний регистр, ё -> е, пунктуация и "_" -> пробел, без лишних пробелов и
+    однобуквенных хвостов ("Преподаватель(и)" -> "преподаватель").
+    """
+    s = _PUNCT_RE.sub(" ", str(value or "").lower().replace("ё", "е"))
+    return " ".join(t for t in s.split() if len(t) > 1 or t.isdigit())
+
+
+def _trigrams(token: str) -> frozenset[str]:
+    padded = f"  {token} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _token_similarity(a: str, b: str, grams_a: frozenset[str], grams_b: frozenset[str]) -> float:
+    """
+    1.0 — совпадение; 0.9 — сокращение ("ауд" / "аудитория") или другое окончание
+    ("преподавателя" / "преподаватель"); иначе — Dice по триграммам.
+    """
+    if a == b:
+        return 1.0
+    short, long_ = (a, b) if len(a) <= len(b) else (b, a)
+    if len(short) >= _MIN_PREFIX and not short.isdigit():
+        if long_.startswith(short):
+            return 0.9
+        common = len(os.path.commonprefix((short, long_)))
+        if common >= 4 and common >= len(short) - 2:
+            return 0.9
+    return 2 * len(grams_a & grams_b) / (len(grams_a) + len(grams_b))
+
+
+class HeaderIndex:
+    """
+    Заголовок -> (поле, уверенность 0..1) по словарю синонимов вида KEY_MAP.
+      1.0     — совпадение после нормализации (пунктуация, пробелы, ё, порядок слов);
+      < 1.0   — по словам (точно, сокращением или по триграммам): каждое слово
+                заголовка обязано найтись в синониме, лишних слов не бывает;
+                уверенность — средняя похожесть слов заголовка, умноженная на
+                долю покрытых слов синонима ("Преподаватели" -> teacher, 0.81).
+    Нечёткое совпадение не бывает 1.0 — по этому отличаем его от точного.
+    Кандидаты отбираются по общим триграммам, а не перебором всего словаря.
+    """
+
+    def __init__(self, key_map: dict[str, str], threshold: float = MATCH_THRESHOLD):
+        self.threshold = threshold
+        self._exact: dict[str, str] = {}
+        self._by_tokens: dict[frozenset[str], str] = {}
+        self._entries: list[tuple[tuple[str, ...], tuple[frozenset[str], ...], str]] = []
+        self._postings: dict[str, set[int]] = defaultdict(set)
+        for key, field in key_map.items():
+            norm = normalize_header(key)
+            if not norm:
+                continue
+            # первый синоним в KEY_MAP главнее
+            self._exact.setdefault(norm, field)
+            tokens = tuple(dict.fromkeys(norm.split()))
+            self._by_tokens.setdefault(frozenset(tokens), field)
+            entry = len(self._entries)
+            self._entries.append((tokens, tuple(_trigrams(t) for t in tokens), field))
+            for token in tokens:
+                for gram in _trigrams(token):
+                    self._postings[gram].add(entry)
+        self.match = lru_cache(maxsize=CACHE_SIZE)(self._match)
+
+    def _match(self, header: str) -> tuple[str | None, float]:
+        norm = normalize_header(header)
+        if not norm:
+            return None, 0.0
+        if norm in self._exact:
+            return self._exact[norm], 1.0
+        tokens = tuple(dict.fromkeys(norm.split()))
+        if frozenset(tokens) in self._by_tokens:
+            return self._by_tokens[frozenset(tokens)], 1.0
+
+        grams = {t: _trigrams(t) for t in tokens}
+        candidates: set[int] = set()
+        for token_grams in grams.values():
+            for gram in token_grams:
+                candidates |= self._postings.get(gram, set())
+
+        best: dict[str, float] = {}
+        for entry in candidates:
+            entry_tokens, entry_grams, field = self._entries[entry]
+            sims = [
+                [_token_similarity(h, k, grams[h], kg) for k, kg in zip(entry_tokens, entry_grams)]
+                for h in tokens
+            ]
+            per_header = [max(row) for row in sims]
+            if min(per_header) < TOKEN_THRESHOLD:
+                continue
+            recall = sum(max(col) for col in zip(*sims)) / len(entry_tokens)
+            precision = sum(per_header) / len(tokens)
+            score = recall * precision
+            if score > best.get(field, 0.0):
+                best[field] = score
+
+        if not best:
+            return None, 0.0
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        field, score = ranked[0]
+        if score < self.threshold:
+            return None, round(score, 3)
+        if len(ranked) > 1 and score - ranked[1][1] < AMBIGUITY_MARGIN:
+            return None, round(score, 3)
+        return field, round(score, 3)
+
+    def resolve(self, header) -> str | None:
+        return self.match(str(header))[0]
+
+    def cache_info(self) -> dict:
+        info = self.match.cache_info()
+        return {"hits": info.hits, "misses": info.misses, "size": info.currsize}
+
+
+HEADER_INDEX = HeaderIndex(KEY_MAP)
+
+
+def match_header(header) -> tuple[str | None, float]:
+    """
+    (поле Lesson или "time", уверенность); поле None — заголовок не распознан.
+    """
+    return HEADER_INDEX.match(str(header))
+
+
+def resolve_header(header) -> str | None:
+    return HEADER_INDEX.resolve(header)
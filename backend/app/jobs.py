@@ -0,0 +1,211 @@
+# backend/app/jobs.py
+import os
+import json
+import time
+import uuid
+import asyncio
+from typing import Any, Awaitable, Callable
+from pathlib import Path
+
+from .storage import connect
+from .parsers import iter_parse_table_with_giga, result_from_summary
+
+# Фоновые задачи разбора: очередь в процессе, состояние и результаты строк — в SQLite
+JOB_WORKERS = max(1, int(os.getenv("JOB_WORKERS", "2")))
+# строки сбрасываются на диск пачками по столько штук
+CHECKPOINT_EVERY = 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id         TEXT PRIMARY KEY,
+    path       TEXT NOT NULL,
+    file       TEXT NOT NULL,
+    sha256     TEXT NOT NULL,
+    options    TEXT NOT NULL,
+    status     TEXT NOT NULL,
+    total      INTEGER NOT NULL DEFAULT 0,
+    done       INTEGER NOT NULL DEFAULT 0,
+    summary    TEXT,
+    error      TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status);
+CREATE TABLE IF NOT EXISTS job_rows (
+    job_id TEXT NOT NULL,
+    idx    INTEGER NOT NULL,
+    lesson TEXT NOT NULL,
+    PRIMARY KEY (job_id, idx)
+);
+"""
+
+_queue: asyncio.Queue | None = None
+_workers: list[asyncio.Task] = []
+_on_result: Callable[[Path, dict, dict], Awaitable[dict]] | None = None
+
+
+def _db():
+    return connect("jobs.sqlite3", _SCHEMA)
+
+
+def _update(job_id: str, **fields: Any) -> None:
+    fields["updated_at"] = time.time()
+    cols = ", ".join(f"{k} = ?" for k in fields)
+    db = _db()
+    db.execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+    db.commit()
+
+
+def create_job(path: Path, file: str, sha256: str, options: dict, post: dict | None = None) -> str:
+    """
+    Регистрирует задачу и ставит её в очередь. Возвращает id.
+    options — параметры конвейера, post — параметры для on_result (ключ расписания и т.п.).
+    """
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    db = _db()
+    db.execute(
+        "INSERT INTO jobs (id, path, file, sha256, options, status, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)",
+        (job_id, str(path), file, sha256, json.dumps({**options, "post": post or {}}), now, now),
+    )
+    db.commit()
+    if _queue is not None:
+        _queue.put_nowait(job_id)
+    return job_id
+
+
+def get_job(job_id: str, offset: int = 0, limit: int | None = None) -> dict | None:
+    """
+    Состояние задачи + уже готовые строки (в том числе частичные).
+    """
+    db = _db()
+    row = db.execute(
+        "SELECT id, file, sha256, status, total, done, summary, error, created_at, updated_at "
+        "FROM jobs WHERE id = ?",
+        (job_id,),
+    ).fetchone()
+    if row is None:
+        return None
+    job = {
+        "job_id": row[0],
+        "file": row[1],
+        "sha256": row[2],
+        "status": row[3],
+        "total": row[4],
+        "done": row[5],
+        "summary": json.loads(row[6]) if row[6] else None,
+        "error": row[7],
+        "created_at": row[8],
+        "updated_at": row[9],
+    }
+    lessons = db.execute(
+        "SELECT lesson FROM job_rows WHERE job_id = ? ORDER BY idx LIMIT ? OFFSET ?",
+        (job_id, -1 if limit is None else limit, offset),
+    ).fetchall()
+    job["normalized"] = [json.loads(r[0]) for r in lessons]
+    return job
+
+
+def _load_checkpoint(job_id: str) -> dict[int, dict]:
+    # строки с ошибкой не считаем готовыми — при возобновлении их стоит повторить
+    known = {}
+    for idx, lesson in _db().execute("SELECT idx, lesson FROM job_rows WHERE job_id = ?", (job_id,)):
+        obj = json.loads(lesson)
+        if "error" not in obj:
+            known[idx] = obj
+    return known
+
+
+def _save_rows(job_id: str, rows: list[tuple[int, dict]], done: int, total: int) -> None:
+    db = _db()
+    db.executemany(
+        "INSERT OR REPLACE INTO job_rows (job_id, idx, lesson) VALUES (?, ?, ?)",
+        [(job_id, idx, json.dumps(obj, ensure_ascii=False)) for idx, obj in rows],
+    )
+    db.commit()
+    _update(job_id, done=done, total=total)
+
+
+async def _run_job(job_id: str) -> None:
+    row = _db().execute("SELECT path, file, sha256, options FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None:
+        return
+    path, options = row[0], json.loads(row[3])
+    post = {"file": row[1], "sha256": row[2], **options.pop("post", {})}
+    known = _load_checkpoint(job_id)
+    _update(job_id, status="running")
+
+    normalized: list[dict] = []
+    buf: list[tuple[int, dict]] = []
+    summary: dict = {}
+    done = total = 0
+    async for record in iter_parse_table_with_giga(path, known=known, **options):
+        if record["type"] == "lesson":
+            idx, obj = record["index"], record["lesson"]
+            done, total = record["done"], record["total"]
+            normalized.append(obj)
+            if known.get(idx) is not obj:
+                buf.append((idx, obj))
+            if len(buf) >= CHECKPOINT_EVERY:
+                _save_rows(job_id, buf, done, total)
+                buf = []
+        elif record["type"] == "summary":
+            summary = {k: v for k, v in record.items() if k != "type"}
+    _save_rows(job_id, buf, done, total)
+
+    if summary.get("status") != "ok":
+        _update(job_id, status="error", error=summary.get("error", "pipeline stopped"))
+        return
+
+    if _on_result is not None:
+        # тот же вид, что у parse_table_with_giga: повторная загрузка отдаст его как есть
+        result = await _on_result(Path(path), result_from_summary(path, summary, normalized), post)
+        # версия расписания, diff, накладки — в summary задачи
+        summary.update({k: result[k] for k in ("schedule", "diff", "conflicts") if k in result})
+    _update(job_id, status="done", summary=json.dumps(summary, ensure_ascii=False))
+
+
+async def _worker() -> None:
+    assert _queue is not None
+    while True:
+        job_id = await _queue.get()
+        try:
+            await _run_job(job_id)
+        except asyncio.CancelledError:
+            # остановка сервиса: задача останется running и возобновится при старте
+            raise
+        except Exception as e:
+            _update(job_id, status="error", error=f"{type(e).__name__}: {e}")
+        finally:
+            _queue.task_done()
+
+
+async def start_job_workers(
+    workers: int | None = None,
+    on_result: Callable[[Path, dict, dict], Awaitable[dict]] | None = None,
+) -> None:
+    """
+    Поднимает пул воркеров и возвращает в очередь незавершённые задачи
+    (queued/running) — они продолжатся с последней сохранённой строки.
+    await on_result(path, result, post) вызывается после успешного разбора файла;
+    post — {"file", "sha256"} и то, что передали в create_job.
+    """
+    global _queue, _on_result
+    _queue = asyncio.Queue()
+    _on_result = on_result
+    for (job_id,) in _db().execute(
+        "SELECT id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+    ):
+        _queue.put_nowait(job_id)
+    for _ in range(workers or JOB_WORKERS):
+        _workers.append(asyncio.create_task(_worker()))
+
+
+async def stop_job_workers() -> None:
+    global _queue
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _queue = None
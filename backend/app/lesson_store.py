@@ -0,0 +1,195 @@
+# backend/app/lesson_store.py
+import json
+import threading
+
+from .storage import connect
+from .mappings import PARITIES, weekday_number, week_parity
+from .semester import SEMESTER_START, parse_date, week_type_on
+
+# Разобранные уроки всех расписаний — для выборок фронтенда (/lessons).
+# Поиск идёт по *_key колонкам: нижний регистр, без пробелов по краям.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lessons (
+    id           INTEGER PRIMARY KEY,
+    schedule_key TEXT NOT NULL,
+    idx          INTEGER NOT NULL,
+    group_key    TEXT NOT NULL,
+    teacher_key  TEXT NOT NULL,
+    room_key     TEXT NOT NULL,
+    weekday_no   INTEGER NOT NULL,
+    date         TEXT NOT NULL,
+    week_type    TEXT NOT NULL,
+    lesson       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS lessons_schedule ON lessons(schedule_key, idx);
+CREATE INDEX IF NOT EXISTS lessons_group ON lessons(group_key, weekday_no);
+CREATE INDEX IF NOT EXISTS lessons_teacher ON lessons(teacher_key, weekday_no);
+CREATE INDEX IF NOT EXISTS lessons_room ON lessons(room_key, weekday_no);
+CREATE INDEX IF NOT EXISTS lessons_weekday ON lessons(weekday_no, week_type);
+CREATE INDEX IF NOT EXISTS lessons_date ON lessons(date);
+CREATE INDEX IF NOT EXISTS lessons_week_type ON lessons(week_type);
+CREATE TABLE IF NOT EXISTS lessons_meta (
+    id       INTEGER PRIMARY KEY CHECK (id = 1),
+    revision INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO lessons_meta (id, revision) VALUES (1, 0);
+"""
+
+# фильтр запроса -> индексируемая колонка
+FILTERS = ("schedule", "group", "teacher", "room", "weekday", "date", "week_type")
+_COLUMNS = {
+    "schedule": "schedule_key",
+    "group": "group_key",
+    "teacher": "teacher_key",
+    "room": "room_key",
+    "weekday": "weekday_no",
+    "date": "date",
+    "week_type": "week_type",
+}
+MAX_LIMIT = 1000
+
+_lock = threading.Lock()
+
+
+def _db():
+    return connect("lessons.sqlite3", _SCHEMA)
+
+
+def _key(value) -> str:
+    return str(value or "").strip().lower()
+
+
+def _week_type_key(value) -> str:
+    # чётность храним канонически ("чётная" -> "четная"), прочее — как есть
+    return week_parity(value) or _key(value)
+
+
+def _filter_value(name: str, value):
+    if name == "weekday":
+        return weekday_number(value)
+    if name == "week_type":
+        return _week_type_key(value)
+    return _key(value)
+
+
+def _stored_date(value) -> str:
+    # даты храним в ISO: Excel ("2024-09-02 00:00:00") и "02.09.2024" приводятся к "2024-09-02"
+    day = parse_date(value)
+    return day.isoformat() if day else str(value or "").strip()
+
+
+def _date_clause(value, semester_start) -> tuple[str, list]:
+    """
+    Уроки на дату: с этой датой или недельные в её день недели.
+    Если известно начало семестра, недельные уроки другой чётности отсекаются;
+    непонятный тип недели ("1-16") считаем «каждую неделю».
+    """
+    day = parse_date(value)
+    if day is None:
+        return "date = ?", [str(value).strip()]
+    clause = "date = ? OR (date = '' AND weekday_no = ?"
+    params: list = [day.isoformat(), day.isoweekday()]
+    start = parse_date(semester_start) if semester_start else SEMESTER_START
+    if start is not None:
+        other = next(p for p in PARITIES if p != week_type_on(day, start))
+        clause += " AND week_type <> ?"
+        params.append(other)
+    return f"({clause}))", params
+
+
+def replace_schedule(schedule_key: str, lessons: list[dict]) -> int:
+    """
+    Уроки расписания целиком заменяются новыми (строки с ошибкой не храним).
+    Возвращает новую ревизию хранилища — от неё считается ETag выборок.
+    lessons — список или любой итерируемый (уроки с диска): строки в базу уходят по одной.
+    """
+    rows = (
+        (
+            schedule_key,
+            i,
+            _key(obj.get("group")),
+            _key(obj.get("teacher")),
+            _key(obj.get("room")),
+            weekday_number(obj.get("weekday")),
+            _stored_date(obj.get("date")),
+            _week_type_key(obj.get("week_type")),
+            json.dumps(obj, ensure_ascii=False),
+        )
+        for i, obj in enumerate(lessons)
+        if "error" not in obj
+    )
+    with _lock:
+        db = _db()
+        with db:
+            db.execute("DELETE FROM lessons WHERE schedule_key = ?", (schedule_key,))
+            db.executemany(
+                "INSERT INTO lessons (schedule_key, idx, group_key, teacher_key, room_key, "
+                "weekday_no, date, week_type, lesson) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            db.execute("UPDATE lessons_meta SET revision = revision + 1 WHERE id = 1")
+        return db.execute("SELECT revision FROM lessons_meta WHERE id = 1").fetchone()[0]
+
+
+def revision() -> int:
+    with _lock:
+        return _db().execute("SELECT revision FROM lessons_meta WHERE id = 1").fetchone()[0]
+
+
+def _where(filters: dict) -> tuple[list[str], list]:
+    where: list[str] = []
+    params: list = []
+    for name in FILTERS:
+        value = filters.get(name)
+        if value is None or value == "":
+            continue
+        if name == "date":
+            clause, values = _date_clause(value, filters.get("semester_start"))
+            where.append(clause)
+            params += values
+            continue
+        where.append(f"{_COLUMNS[name]} = ?")
+        params.append(_filter_value(name, value))
+    return where, params
+
+
+def query_lessons(filters: dict, limit: int = 100, cursor: int = 0) -> dict:
+    """
+    Уроки по фильтрам (точное совпадение без учёта регистра), в порядке загрузки.
+    date — уроки на эту дату, в том числе недельные (semester_start — для чётности недели).
+    Пагинация по курсору: next_cursor передаётся в следующий запрос, None — дальше пусто.
+    """
+    where, params = _where(filters)
+    where.insert(0, "id > ?")
+    params.insert(0, max(0, cursor))
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    with _lock:
+        db = _db()
+        rows = db.execute(
+            f"SELECT id, schedule_key, lesson FROM lessons WHERE {' AND '.join(where)} ORDER BY id LIMIT ?",
+            (*params, limit + 1),
+        ).fetchall()
+        rev = db.execute("SELECT revision FROM lessons_meta WHERE id = 1").fetchone()[0]
+
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "items": [{"schedule": key, **json.loads(lesson)} for _, key, lesson in rows],
+        "next_cursor": rows[-1][0] if more else None,
+        "revision": rev,
+    }
+
+
+def all_lessons(schedule: str | None = None, filters: dict | None = None) -> list[tuple[str, int, dict]]:
+    """
+    [(ключ расписания, номер строки, урок)] — всё хранилище, одно расписание
+    или выборка по тем же фильтрам, что у query_lessons.
+    """
+    where, params = _where({**(filters or {}), "schedule": schedule or (filters or {}).get("schedule")})
+    sql = "SELECT schedule_key, idx, lesson FROM lessons"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    with _lock:
+        rows = _db().execute(sql + " ORDER BY id", params).fetchall()
+    return [(key, idx, json.loads(lesson)) for key, idx, lesson in rows]
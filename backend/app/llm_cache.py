@@ -0,0 +1,153 @@
+# backend/app/llm_cache.py
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Any
+
+from .storage import connect
+
+# Кэш разобранных ответов модели по строкам таблицы (SQLite, LRU + TTL)
+CACHE_ENABLED = os.getenv("GIGACHAT_CACHE", "true").lower() in ("1", "true", "yes")
+CACHE_MAX_ENTRIES = int(os.getenv("GIGACHAT_CACHE_MAX_ENTRIES", "100000"))
+CACHE_TTL_S = float(os.getenv("GIGACHAT_CACHE_TTL", str(30 * 24 * 3600)))
+# чистим устаревшее не на каждую запись, а раз в столько вставок
+_EVICT_EVERY = 500
+# ключей в одном "IN (...)" у cache_get_many (лимит переменных SQLite — 999 в старых сборках)
+_IN_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key        TEXT PRIMARY KEY,
+    parsed     TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    used_at    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS llm_cache_used_at ON llm_cache(used_at);
+"""
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "writes": 0, "evicted": 0}
+_puts_since_evict = 0
+
+
+def _db():
+    return connect("llm_cache.sqlite3", _SCHEMA)
+
+
+def cache_key(model: str, system_prompt: str, row: str) -> str:
+    """
+    Ключ = sha256(модель + system prompt + текст строки).
+    Смена модели или промпта автоматически даёт новые ключи.
+    """
+    h = hashlib.sha256()
+    for part in (model, system_prompt, row):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def cache_get(key: str) -> Any | None:
+    """
+    Разобранный ответ модели для ключа или None (нет / протух).
+    """
+    now = time.time()
+    with _lock:
+        db = _db()
+        row = db.execute("SELECT parsed, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is None or now - row[1] > CACHE_TTL_S:
+            _stats["misses"] += 1
+            return None
+        db.execute("UPDATE llm_cache SET used_at = ? WHERE key = ?", (now, key))
+        db.commit()
+        _stats["hits"] += 1
+    return json.loads(row[0])
+
+
+def cache_get_many(keys: list[str]) -> dict[str, Any]:
+    """
+    cache_get для многих ключей сразу: {ключ: разобранный ответ} для найденных и не протухших.
+    Выборка пачками по _IN_CHUNK ключей, used_at — одним UPDATE на пачку, commit один.
+    Блокирует: из async-кода звать через asyncio.to_thread.
+    """
+    now = time.time()
+    keys = list(dict.fromkeys(keys))
+    found: dict[str, str] = {}
+    with _lock:
+        db = _db()
+        for start in range(0, len(keys), _IN_CHUNK):
+            chunk = keys[start:start + _IN_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            rows = db.execute(
+                f"SELECT key, parsed FROM llm_cache WHERE key IN ({marks}) AND created_at >= ?",
+                (*chunk, now - CACHE_TTL_S),
+            ).fetchall()
+            if rows:
+                db.execute(
+                    f"UPDATE llm_cache SET used_at = ? WHERE key IN ({','.join('?' * len(rows))})",
+                    (now, *(key for key, _ in rows)),
+                )
+            found.update(rows)
+        db.commit()
+        _stats["hits"] += len(found)
+        _stats["misses"] += len(keys) - len(found)
+    return {key: json.loads(parsed) for key, parsed in found.items()}
+
+
+def cache_put(key: str, parsed: Any) -> None:
+    global _puts_since_evict
+    if parsed is None:
+        return
+    now = time.time()
+    with _lock:
+        db = _db()
+        db.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, parsed, created_at, used_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(parsed, ensure_ascii=False), now, now),
+        )
+        db.commit()
+        _stats["writes"] += 1
+        _puts_since_evict += 1
+        if _puts_since_evict >= _EVICT_EVERY:
+            _puts_since_evict = 0
+            _evict_locked(now)
+
+
+def _evict_locked(now: float) -> None:
+    """
+    Удаляем протухшие записи, затем самые давно использованные сверх лимита.
+    """
+    db = _db()
+    n = db.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - CACHE_TTL_S,)).rowcount
+    total = db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+    if total > CACHE_MAX_ENTRIES:
+        n += db.execute(
+            "DELETE FROM llm_cache WHERE key IN "
+            "(SELECT key FROM llm_cache ORDER BY used_at LIMIT ?)",
+            (total - CACHE_MAX_ENTRIES,),
+        ).rowcount
+    db.commit()
+    _stats["evicted"] += n
+
+
+def cache_evict() -> None:
+    with _lock:
+        _evict_locked(time.time())
+
+
+def cache_purge() -> int:
+    """
+    Полная очистка кэша. Возвращает число удалённых записей.
+    """
+    with _lock:
+        db = _db()
+        n = db.execute("DELETE FROM llm_cache").rowcount
+        db.commit()
+    return n
+
+
+def cache_stats() -> dict:
+    with _lock:
+        entries = _db().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        return {**_stats, "entries": entries, "enabled": CACHE_ENABLED}
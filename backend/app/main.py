@@ -1,18 +1,715 @@
 # backend/app/main.py
-from fastapi import FastAPI, UploadFile, File
-from pathlib import Path
-from .parsers import parse_table_with_giga
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import zipfile
+import tempfile
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Response, Query
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
+from pathlib import Path, PurePosixPath
+from .parsers import (
+    parse_table_with_giga,
+    iter_parse_table_with_giga,
+    result_from_summary,
+    shutdown_read_pool,
+    lessons_to_columns,
+    warm_up_readers,
+)
+from .giga_client import init_http_client, close_http_client, warm_up, MAX_CONCURRENCY
+from .llm_cache import cache_stats, cache_purge
+from .resilience import resilience_stats
+from .jobs import create_job, get_job, start_job_workers, stop_job_workers
+from .metrics import register_collector, render as render_metrics
+from .header_index import HEADER_INDEX
+from .schedule_versions import (
+    schedule_key,
+    get_version,
+    save_version,
+    reusable_rows,
+    diff_versions,
+    row_fingerprint,
+    lesson_fingerprints,
+    archive_member_key,
+)
+from .lesson_store import replace_schedule, query_lessons, all_lessons, revision as lessons_revision
+from .conflicts import KINDS as CONFLICT_KINDS, detect_conflicts
+from .semester import parse_date, iter_occurrences, iter_ics
+from .mappings import weekday_number
+from .dispatch import FairDispatcher
+
+try:
+    import orjson
+except ImportError:
+    # необязательная зависимость: без неё — стандартный json
+    orjson = None
 
 STORAGE = Path("uploads")
-STORAGE.mkdir(exist_ok=True)
+# прогрев на старте: токен GigaChat, соединение в пуле, pandas и движок Excel.
+# Сервис начинает принимать запросы только после него
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "false").lower() in ("1", "true", "yes")
+# размер куска при потоковой записи загрузки на диск
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# /upload/bulk: сколько таблиц (с учётом содержимого ZIP) и сколько байт распакованного ZIP принимаем
+BULK_MAX_FILES = int(os.getenv("BULK_MAX_FILES", "200"))
+BULK_MAX_UNZIPPED = int(os.getenv("BULK_MAX_UNZIPPED_MB", "500")) * 1024 * 1024
+TABLE_EXTS = {".csv", ".tsv", ".txt", ".xlsx", ".xlsm", ".xls", ".xlsb", ".ods"}
+
+# состояние лимитера/breaker и кэша — gauge'ами рядом с метриками конвейера
+register_collector("campus_gigachat", resilience_stats)
+register_collector("campus_llm_cache", cache_stats)
+register_collector("campus_header_index", HEADER_INDEX.cache_info)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    STORAGE.mkdir(exist_ok=True)
+    # один пул соединений к GigaChat на всё приложение
+    await init_http_client()
+    app.state.warmup = None
+    if STARTUP_WARMUP:
+        t0 = time.perf_counter()
+        # импорты читателей — в потоке, параллельно с походом за токеном
+        gigachat, readers = await asyncio.gather(warm_up(), asyncio.to_thread(warm_up_readers))
+        app.state.warmup = {"gigachat": gigachat, "readers": readers, "seconds": round(time.perf_counter() - t0, 3)}
+    # фоновые разборы; незаконченные продолжатся с последней сохранённой строки
+    await start_job_workers(on_result=_finish_job)
+    try:
+        yield
+    finally:
+        await stop_job_workers()
+        await close_http_client()
+        shutdown_read_pool()
+
+def _dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """
+    Тот же JSON, что у JSONResponse, но через orjson, если он установлен.
+    Отданный напрямую, ещё и минует jsonable_encoder — на 20k уроков это заметно.
+    """
+
+    def render(self, content) -> bytes:
+        return _dumps(content)
+
+app = FastAPI(title="Campus Schedule Uploader", lifespan=lifespan, default_response_class=FastJSONResponse)
+
+async def _save_upload(file: UploadFile) -> tuple[Path, str]:
+    """
+    Пишем загрузку на диск кусками, попутно считая sha256.
+    Файл хранится под хэшем содержимого: одинаковые имена не затирают друг друга.
+    """
+    ext = Path(file.filename or "").suffix.lower()
+    h = hashlib.sha256()
+    tmp_path = STORAGE / f".{uuid.uuid4().hex}.part"
+    try:
+        with open(tmp_path, "wb") as f:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                h.update(chunk)
+                f.write(chunk)
+        return _commit_upload(tmp_path, h.hexdigest(), ext), h.hexdigest()
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+def _commit_upload(tmp_path: Path, digest: str, ext: str) -> Path:
+    file_path = STORAGE / f"{digest}{ext}"
+    os.replace(tmp_path, file_path)
+    return file_path
+
+def _extract_zip(archive: Path, archive_name: str) -> list[tuple[str, Path, str, str]]:
+    """
+    Таблицы из ZIP -> [(путь в архиве, путь в хранилище, sha256, ключ расписания)].
+    Каталоги, служебные файлы и всё, что не таблица, пропускаем; объём распакованного ограничен.
+    Путь в архиве — только подпись и ключ (archive_member_key): на диск файл ложится под своим хэшем.
+    """
+    out = []
+    unzipped = 0
+    with zipfile.ZipFile(archive) as zf:
+        for info in zf.infolist():
+            parts = PurePosixPath(info.filename.replace("\\", "/")).parts
+            member = "/".join(p for p in parts if p not in ("", ".", "..", "/"))
+            name = PurePosixPath(member).name
+            ext = Path(name).suffix.lower()
+            if info.is_dir() or not name or name.startswith(("._", "~$")) or ext not in TABLE_EXTS:
+                continue
+            unzipped += info.file_size
+            if unzipped > BULK_MAX_UNZIPPED or len(out) >= BULK_MAX_FILES:
+                raise HTTPException(status_code=413, detail="archive is too large")
+            h = hashlib.sha256()
+            tmp_path = STORAGE / f".{uuid.uuid4().hex}.part"
+            try:
+                with zf.open(info) as src, open(tmp_path, "wb") as f:
+                    while chunk := src.read(UPLOAD_CHUNK_SIZE):
+                        h.update(chunk)
+                        f.write(chunk)
+                file_path = _commit_upload(tmp_path, h.hexdigest(), ext)
+                out.append((member, file_path, h.hexdigest(), archive_member_key(archive_name, member)))
+            finally:
+                tmp_path.unlink(missing_ok=True)
+    return out
+
+def _result_path(file_path: Path) -> Path:
+    return file_path.with_name(file_path.name + ".result.json")
+
+def _load_result(file_path: Path) -> dict | None:
+    try:
+        with open(_result_path(file_path), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _store_result(file_path: Path, result: dict) -> None:
+    # сохраняем только полностью успешный разбор — строки с ошибками и локальным
+    # разбором при открытом breaker стоит повторить: на такой строке файл бросаем
+    if result.get("status") != "ok":
+        return
+    tmp_path = _result_path(file_path).with_suffix(".part")
+    complete = False
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        # уроки пишем по одному: у потоковой загрузки они лежат на диске (_LessonSpool)
+        head = json.dumps({k: v for k, v in result.items() if k != "normalized"}, ensure_ascii=False)
+        f.write(head[:-1] + (", " if len(head) > 2 else "") + '"normalized": [')
+        for i, obj in enumerate(result.get("normalized", [])):
+            if "error" in obj or obj.get("fallback"):
+                break
+            if i:
+                f.write(", ")
+            f.write(json.dumps(obj, ensure_ascii=False))
+        else:
+            f.write("]}")
+            complete = True
+    if complete:
+        os.replace(tmp_path, _result_path(file_path))
+    else:
+        tmp_path.unlink(missing_ok=True)
+
+class _LessonSpool:
+    """
+    Уроки потоковой загрузки во временном JSONL рядом с файлом: в памяти только
+    отпечатки строк. Читается повторно как список (len, итерация) — этого хватает
+    _finish_upload: результат на диск, diff, версия расписания, хранилище уроков.
+    """
 
-app = FastAPI(title="Campus Schedule Uploader")
+    def __init__(self, directory: Path):
+        fd, name = tempfile.mkstemp(dir=directory, suffix=".lessons.jsonl")
+        self.path = Path(name)
+        self._file = os.fdopen(fd, "w", encoding="utf-8")
+        self.fingerprints: list[str] = []
+
+    def append(self, obj: dict) -> None:
+        self._file.write(json.dumps(obj, ensure_ascii=False) + "\n")
+        self.fingerprints.append(row_fingerprint(obj.get("raw", "")))
+
+    def close(self) -> None:
+        self._file.close()
+
+    def discard(self) -> None:
+        self._file.close()
+        self.path.unlink(missing_ok=True)
+
+    def __len__(self) -> int:
+        return len(self.fingerprints)
+
+    def __iter__(self):
+        self._file.flush()
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
 
 @app.post("/upload")
-async def upload(file: UploadFile = File(...)):
-    file_path = STORAGE / file.filename
-    with open(file_path, "wb") as f:
-        f.write(await file.read())
+async def upload(
+    file: UploadFile = File(...),
+    batch_size: int | None = None,
+    local_bypass: bool | None = None,
+    use_cache: bool | None = None,
+    refresh_cache: bool = False,
+    column_mapping: bool | None = None,
+    dedup: bool | None = None,
+    force: bool = False,
+    background: bool = False,
+    layout: str = "rows",
+    schedule: str | None = None,
+    incremental: bool = True,
+    conflicts: bool = False,
+):
+    """
+    layout=rows (по умолчанию) — normalized списком уроков;
+    layout=columnar — normalized как {поле: [значения]}, по массиву на поле.
+    schedule — ключ расписания (по умолчанию имя файла). При incremental строки,
+    не изменившиеся с прошлой версии этого расписания, не разбираются заново,
+    а в ответе есть "diff": added / removed / changed относительно прошлой версии
+    (новые уроки — номерами в normalized; у первой версии diff — null).
+    conflicts=true — ещё и накладки аудиторий/преподавателей/групп внутри файла
+    (номера уроков — позиции в normalized).
+    """
+    if layout not in ("rows", "columnar"):
+        raise HTTPException(status_code=400, detail="layout must be 'rows' or 'columnar'")
+
+    file_path, digest = await _save_upload(file)
+
+    if background and (force or _load_result(file_path) is None):
+        # длинный разбор не держим на HTTP-запросе: статус — в /jobs/{job_id}
+        job_id = create_job(file_path.resolve(), file.filename, digest, {
+            "batch_size": batch_size,
+            "local_bypass": local_bypass,
+            "use_cache": use_cache,
+            "refresh_cache": refresh_cache,
+            "column_mapping": column_mapping,
+            "dedup": dedup,
+        }, post={
+            "schedule": schedule_key(schedule or file.filename or file_path.name),
+            "incremental": incremental,
+            "conflicts": conflicts,
+        })
+        return {"status": "queued", "job_id": job_id, "file": file.filename, "sha256": digest}
+
+    result = await _parse_upload(
+        file_path, digest, file.filename or file_path.name,
+        options={
+            "batch_size": batch_size,
+            "local_bypass": local_bypass,
+            "use_cache": use_cache,
+            "refresh_cache": refresh_cache,
+            "column_mapping": column_mapping,
+            "dedup": dedup,
+        },
+        schedule=schedule,
+        incremental=incremental,
+        conflicts=conflicts,
+        force=force,
+    )
+    return _upload_response(result, layout)
+
+async def _parse_upload(
+    file_path: Path,
+    digest: str,
+    filename: str,
+    options: dict,
+    schedule: str | None = None,
+    incremental: bool = True,
+    conflicts: bool = False,
+    dispatch: FairDispatcher | None = None,
+    force: bool = False,
+    key: str | None = None,
+) -> dict:
+    """
+    Разбор сохранённой загрузки + всё, что после: результат на диск, версия расписания
+    и diff с прошлой, хранилище уроков, по желанию — накладки.
+    Если этот же файл уже разбирали (и не force), пропускается только сам разбор.
+    key — готовый ключ расписания (файлы из ZIP), иначе он из schedule или имени файла.
+    """
+    key = key or schedule_key(schedule or filename)
+    previous = get_version(key) if incremental else None
+    stored = None if force else _load_result(file_path)
+    if stored is not None:
+        result = stored
+    else:
+        result = await parse_table_with_giga(
+            str(file_path),
+            **options,
+            reuse=reusable_rows(previous),
+            dispatch=dispatch,
+        )
+    return await _finish_upload(
+        file_path, digest, filename, result, key, previous,
+        incremental=incremental, conflicts=conflicts, deduplicated=stored is not None,
+    )
+
+async def _finish_upload(
+    file_path: Path,
+    digest: str,
+    filename: str,
+    result: dict,
+    key: str,
+    previous: dict | None,
+    incremental: bool = True,
+    conflicts: bool = False,
+    deduplicated: bool = False,
+) -> dict:
+    """
+    Общий хвост всех загрузок (/upload, /upload/bulk, /upload/stream, фоновые задачи):
+    результат на диск, diff с прошлой версией, новая версия расписания, хранилище уроков
+    и по желанию накладки. Повтор уже сохранённого файла под тем же ключом новой версии не заводит.
+    Уроки (result["normalized"]) — список или _LessonSpool; SQLite и диск — в потоке.
+    """
+    if not deduplicated:
+        await asyncio.to_thread(_store_result, file_path, result)
+
+    if result.get("status") == "ok":
+        lessons = result["normalized"]
+        fingerprints = lessons.fingerprints if isinstance(lessons, _LessonSpool) else lesson_fingerprints(lessons)
+        if incremental:
+            result["diff"] = await asyncio.to_thread(diff_versions, previous, fingerprints)
+        current = (previous if incremental else await asyncio.to_thread(get_version, key)) if deduplicated else None
+        if current is not None and current["sha256"] == digest:
+            # сохранённый результат того же файла — это и есть текущая версия
+            version = current["version"]
+        else:
+            version = await asyncio.to_thread(save_version, key, filename, digest, lessons, fingerprints)
+            await asyncio.to_thread(replace_schedule, key, lessons)
+        result["schedule"] = {"key": key, "version": version}
+        if conflicts:
+            # накладки ищутся по всему файлу сразу — здесь уроки нужны в памяти
+            loaded = lessons if isinstance(lessons, list) else list(lessons)
+            result["conflicts"] = await asyncio.to_thread(detect_conflicts, loaded)
+    return {**result, "file": filename, "sha256": digest, "deduplicated": deduplicated}
+
+async def _finish_job(file_path: Path, result: dict, post: dict) -> dict:
+    # фоновый разбор закончен — тот же хвост, что у синхронной загрузки
+    key = post.get("schedule") or schedule_key(post["file"])
+    incremental = post.get("incremental", True)
+    return await _finish_upload(
+        file_path, post["sha256"], post["file"], result, key,
+        get_version(key) if incremental else None,
+        incremental=incremental, conflicts=post.get("conflicts", False),
+    )
+
+@app.post("/upload/bulk")
+async def upload_bulk(
+    files: list[UploadFile] = File(...),
+    batch_size: int | None = None,
+    local_bypass: bool | None = None,
+    use_cache: bool | None = None,
+    refresh_cache: bool = False,
+    column_mapping: bool | None = None,
+    dedup: bool | None = None,
+    force: bool = False,
+    incremental: bool = True,
+    max_concurrency: int | None = None,
+):
+    """
+    Много таблиц и/или ZIP-архивов за один запрос. Файлы читаются и разбираются
+    параллельно, а строки всех файлов делят один бюджет запросов к GigaChat
+    (max_concurrency, по умолчанию GIGACHAT_MAX_CONCURRENCY), по кругу между файлами.
+    Ответ: результат по каждому файлу (как у /upload) и общая статистика.
+    Расписание файла из ZIP — по имени архива и пути внутри него; два файла
+    с одним ключом в одном запросе — 400 (иначе они затёрли бы версии друг друга).
+    """
+    started = time.perf_counter()
+    entries: list[tuple[str, Path, str, str]] = []
+    for upload_file in files:
+        file_path, digest = await _save_upload(upload_file)
+        name = upload_file.filename or file_path.name
+        if file_path.suffix == ".zip":
+            entries += await asyncio.to_thread(_extract_zip, file_path, name)
+            file_path.unlink(missing_ok=True)
+        else:
+            entries.append((name, file_path, digest, schedule_key(name)))
+        if len(entries) > BULK_MAX_FILES:
+            raise HTTPException(status_code=413, detail=f"at most {BULK_MAX_FILES} files per request")
+
+    keys = [key for *_, key in entries]
+    duplicates = sorted({key for key in keys if keys.count(key) > 1})
+    if duplicates:
+        raise HTTPException(status_code=400, detail=f"duplicate schedules in one request: {', '.join(duplicates)}")
+
+    options = {
+        "batch_size": batch_size,
+        "local_bypass": local_bypass,
+        "use_cache": use_cache,
+        "refresh_cache": refresh_cache,
+        "column_mapping": column_mapping,
+        "dedup": dedup,
+        "max_concurrency": max_concurrency,
+    }
+    dispatch = FairDispatcher(max_concurrency or MAX_CONCURRENCY)
+
+    async def one(name: str, file_path: Path, digest: str, key: str) -> dict:
+        try:
+            return await _parse_upload(
+                file_path, digest, name, options, incremental=incremental, dispatch=dispatch, force=force, key=key,
+            )
+        except Exception as e:
+            return {"status": "error", "error": f"{type(e).__name__}: {e}", "file": name, "sha256": digest}
+
+    results = await asyncio.gather(*(one(*entry) for entry in entries))
+
+    wall = time.perf_counter() - started
+    rows = sum(r.get("count", 0) for r in results if r.get("status") == "ok")
+    # у повторно присланных файлов метрики прошлого разбора — их не считаем
+    fresh = [r.get("metrics", {}) for r in results if not r.get("deduplicated")]
+    return FastJSONResponse({
+        "status": "ok" if all(r.get("status") == "ok" for r in results) else "partial",
+        "files": results,
+        "stats": {
+            "files": len(results),
+            "ok": sum(r.get("status") == "ok" for r in results),
+            "errors": sum(r.get("status") != "ok" for r in results),
+            "deduplicated": sum(bool(r.get("deduplicated")) for r in results),
+            "rows": rows,
+            "llm_calls": sum(m.get("llm_calls", 0) for m in fresh),
+            "tokens": sum(m.get("tokens", {}).get("total", 0) for m in fresh),
+            "wall_seconds": round(wall, 3),
+            "rows_per_second": round(rows / wall, 1) if wall > 0 else 0.0,
+        },
+    })
+
+def _upload_response(payload: dict, layout: str) -> FastJSONResponse:
+    if layout == "columnar" and "normalized" in payload:
+        payload = {**payload, "layout": "columnar", "normalized": lessons_to_columns(payload["normalized"])}
+    return FastJSONResponse(payload)
+
+async def _replay_result(stored: dict) -> AsyncIterator[dict]:
+    """
+    Сохранённый результат в виде тех же записей, что отдаёт потоковый конвейер.
+    """
+    for sheet in stored.get("sheets", []):
+        yield {"type": "sheet", **sheet}
+    normalized = stored.get("normalized", [])
+    for i, obj in enumerate(normalized):
+        yield {"type": "lesson", "index": i, "done": i + 1, "total": len(normalized), "lesson": obj}
+    yield {
+        "type": "summary",
+        **{k: v for k, v in stored.items() if k != "normalized"},
+    }
+
+def _encode_record(record: dict, fmt: str) -> bytes:
+    data = _dumps(record)
+    if fmt == "sse":
+        return f"event: {record['type']}\ndata: ".encode() + data + b"\n\n"
+    return data + b"\n"
+
+@app.post("/upload/stream")
+async def upload_stream(
+    file: UploadFile = File(...),
+    format: str = "ndjson",
+    batch_size: int | None = None,
+    local_bypass: bool | None = None,
+    use_cache: bool | None = None,
+    refresh_cache: bool = False,
+    column_mapping: bool | None = None,
+    dedup: bool | None = None,
+    force: bool = False,
+    schedule: str | None = None,
+    incremental: bool = True,
+    conflicts: bool = False,
+):
+    """
+    То же, что /upload, но уроки уходят клиенту по мере готовности:
+    NDJSON (по записи на строку) или Server-Sent Events (format=sse).
+    Последняя запись — summary; в ней же версия расписания, diff и накладки, как у /upload.
+    """
+    if format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'sse'")
+
+    file_path, digest = await _save_upload(file)
+    filename = file.filename or file_path.name
+    key = schedule_key(schedule or filename)
+    previous = get_version(key) if incremental else None
+    stored = None if force else _load_result(file_path)
+    if stored is not None:
+        records = _replay_result(stored)
+    else:
+        records = iter_parse_table_with_giga(
+            str(file_path),
+            batch_size=batch_size,
+            local_bypass=local_bypass,
+            use_cache=use_cache,
+            refresh_cache=refresh_cache,
+            column_mapping=column_mapping,
+            dedup=dedup,
+            reuse=reusable_rows(previous),
+        )
+
+    async def body() -> AsyncIterator[bytes]:
+        # уроки копятся на диске, а не в памяти: поток держит память ровной на любом файле
+        spool = _LessonSpool(file_path.parent) if stored is None else None
+        try:
+            async for record in records:
+                if record["type"] == "lesson":
+                    if spool is not None:
+                        spool.append(record["lesson"])
+                elif record["type"] == "summary":
+                    summary = {k: v for k, v in record.items() if k != "type"}
+                    result = stored if stored is not None else result_from_summary(str(file_path), summary, spool)
+                    result = await _finish_upload(
+                        file_path, digest, filename, result, key, previous,
+                        incremental=incremental, conflicts=conflicts, deduplicated=stored is not None,
+                    )
+                    record = {
+                        **record,
+                        **{k: result[k] for k in ("schedule", "diff", "conflicts") if k in result},
+                        "file": filename,
+                        "sha256": digest,
+                        "deduplicated": stored is not None,
+                    }
+                yield _encode_record(record, format)
+        except Exception as e:
+            # заголовки уже ушли — сообщаем об ошибке последней записью
+            yield _encode_record({
+                "type": "summary",
+                "status": "error",
+                "error": f"{type(e).__name__}: {e}",
+                "file": filename,
+                "sha256": digest,
+            }, format)
+        finally:
+            if spool is not None:
+                spool.discard()
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(body(), media_type=media_type)
+
+def _lessons_etag(rev: int, params: dict) -> str:
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+    return f'W/"{rev}-{digest}"'
+
+def _etag_matches(header: str | None, etag: str) -> bool:
+    if not header:
+        return False
+    return header.strip() == "*" or etag in (t.strip() for t in header.split(","))
+
+@app.get("/lessons")
+async def lessons(
+    request: Request,
+    schedule: str | None = None,
+    group: str | None = None,
+    teacher: str | None = None,
+    room: str | None = None,
+    weekday: str | None = None,
+    date: str | None = None,
+    week_type: str | None = None,
+    semester_start: str | None = None,
+    limit: int = 100,
+    cursor: int = 0,
+):
+    """
+    Выборка сохранённых уроков по индексам (группа, преподаватель, аудитория,
+    день недели/дата, тип недели). Пагинация: cursor=<next_cursor прошлой страницы>.
+    date — всё, что идёт в этот день: уроки с этой датой и недельные уроки её дня недели;
+    чётность недели считается от semester_start (по умолчанию SEMESTER_START).
+    ETag меняется с каждой загрузкой расписания; If-None-Match -> 304.
+    """
+    if weekday and not weekday_number(weekday):
+        raise HTTPException(status_code=400, detail="weekday must be a day name (понедельник, пн, monday) or 1-7")
+    if date:
+        _required_date(date, "date")
+    if semester_start:
+        _required_date(semester_start, "semester_start")
+    params = {
+        "schedule": schedule, "group": group, "teacher": teacher, "room": room,
+        "weekday": weekday, "date": date, "week_type": week_type,
+        "semester_start": semester_start, "limit": limit, "cursor": cursor,
+    }
+    # ревизия дешевле выборки: неизменившиеся данные отдаём без запроса к урокам
+    # SQLite — в потоке, как у /conflicts и /calendar
+    etag = _lessons_etag(await asyncio.to_thread(lessons_revision), params)
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    page = await asyncio.to_thread(query_lessons, params, limit, cursor)
+    return FastJSONResponse(page, headers={
+        "ETag": _lessons_etag(page["revision"], params),
+        "Cache-Control": "no-cache",
+    })
+
+def _parse_kinds(kind: str | None) -> tuple[str, ...]:
+    if not kind:
+        return CONFLICT_KINDS
+    kinds = tuple(k.strip() for k in kind.split(",") if k.strip())
+    unknown = [k for k in kinds if k not in CONFLICT_KINDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(CONFLICT_KINDS)}")
+    return kinds
+
+@app.get("/conflicts")
+async def conflicts(schedule: str | None = None, kind: str | None = None):
+    """
+    Накладки по всем сохранённым расписаниям (или одному: schedule=...).
+    kind — room, teacher, group или несколько через запятую.
+    """
+    kinds = _parse_kinds(kind)
+    stored = await asyncio.to_thread(all_lessons, schedule)
+    report = await asyncio.to_thread(detect_conflicts, [obj for _, _, obj in stored], kinds)
+    for conflict in report["conflicts"]:
+        conflict["lessons"] = [
+            {"schedule": stored[i][0], "index": stored[i][1], **{k: v for k, v in stored[i][2].items() if k != "raw"}}
+            for i in conflict["lessons"]
+        ]
+    return FastJSONResponse(report)
+
+def _required_date(value: str, name: str):
+    parsed = parse_date(value)
+    if parsed is None:
+        raise HTTPException(status_code=400, detail=f"{name} must be a date (YYYY-MM-DD or DD.MM.YYYY)")
+    return parsed
+
+@app.get("/calendar")
+async def calendar(
+    semester_start: str,
+    semester_end: str,
+    date_from: str | None = Query(None, alias="from"),
+    date_to: str | None = Query(None, alias="to"),
+    schedule: str | None = None,
+    group: str | None = None,
+    teacher: str | None = None,
+    room: str | None = None,
+    format: str = "json",
+):
+    """
+    Сохранённые уроки, развёрнутые в даты семестра: JSON-массив занятий или iCalendar (format=ics).
+    from/to — окно внутри семестра. Отдаётся потоком, по занятию за раз.
+    """
+    if format not in ("json", "ics"):
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'ics'")
+    start = _required_date(semester_start, "semester_start")
+    end = _required_date(semester_end, "semester_end")
+    window_start = _required_date(date_from, "from") if date_from else None
+    window_end = _required_date(date_to, "to") if date_to else None
+
+    filters = {"group": group, "teacher": teacher, "room": room}
+    stored = await asyncio.to_thread(all_lessons, schedule, filters)
+    occurrences = iter_occurrences(
+        (({"schedule": key, "index": idx}, obj) for key, idx, obj in stored),
+        start, end, window_start, window_end,
+    )
+
+    if format == "ics":
+        name = " ".join(v for v in (schedule, group, teacher, room) if v) or "Расписание"
+        return StreamingResponse(
+            (chunk.encode("utf-8") for chunk in iter_ics(occurrences, name)),
+            media_type="text/calendar; charset=utf-8",
+            headers={"Content-Disposition": 'attachment; filename="schedule.ics"'},
+        )
+
+    def body():
+        yield b"["
+        for i, occ in enumerate(occurrences):
+            yield (b"," if i else b"") + _dumps(occ)
+        yield b"]"
+
+    return StreamingResponse(body(), media_type="application/json")
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str, offset: int = 0, limit: int | None = None):
+    job = get_job(job_id, offset=offset, limit=limit)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job
+
+@app.get("/gigachat/health")
+async def gigachat_health():
+    # ожидания лимитера, повторы и состояние circuit breaker; итог прогрева, если он был
+    stats = resilience_stats()
+    if getattr(app.state, "warmup", None) is not None:
+        stats = {**stats, "warmup": app.state.warmup}
+    return stats
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Prometheus text format: стадии конвейера, запросы к GigaChat, токены, fallback
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/cache")
+async def get_cache_stats():
+    return cache_stats()
 
-    result = await parse_table_with_giga(str(file_path))
-    return result
+@app.delete("/cache")
+async def purge_cache():
+    return {"status": "ok", "purged": cache_purge()}
@@ -149,6 +149,7 @@ KEY_MAP: dict[str, str] = {
         "week parity": "week_type",
         "parity": "week_type",
         "неделя": "week_type",         # иногда пишут 'чётная/нечётная' прямо в колонке 'Неделя'
+        "week": "week_type",           # как 'неделя'; без этого 'week' ушло бы в weekday по префиксу
         "номер недели": "week_type",   # встречается как '1-16', '1-8', 'чётные'
 
         # === Комментарии / примечания ===
@@ -192,6 +193,30 @@ WEEKDAY_ORDER = {
     "пт": 5,
 }
 
+def weekday_number(value) -> int:
+    """
+    "Понедельник" / "пн" / "monday" / "1" -> 1; неизвестное -> 0.
+    """
+    key = str(value or "").strip().lower()
+    if key.isdigit():
+        n = int(key)
+        return n if 1 <= n <= 7 else 0
+    return WEEKDAY_ORDER.get(key, 0)
+
+# чётность недели в каноническом виде; всё прочее ("оба", "1-16") — «каждую неделю»
+PARITIES = ("четная", "нечетная")
+
+def week_parity(value) -> str:
+    """
+    "Чётная неделя" / "чет." -> "четная"; "нечётная" / "неч." -> "нечетная"; иное -> "".
+    """
+    key = str(value or "").strip().lower().replace("ё", "е")
+    if key.startswith("неч"):
+        return PARITIES[1]
+    if key.startswith("чет"):
+        return PARITIES[0]
+    return ""
+
 # известные начала пар, чтобы номера совпадали с реальными
 PAIR_START_TIMES = [
     "08:30",
@@ -0,0 +1,272 @@
+# backend/app/metrics.py
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator
+
+# Метрики в формате Prometheus (text exposition 0.0.4) без prometheus_client:
+# счётчики и гистограммы на процесс + сводка по текущей загрузке (UploadMetrics)
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_str(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _num(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_str(self.labels, key)} {_num(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [счётчики по корзинам..., sum, count]
+        self._values: dict[tuple[str, ...], list[float]] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, row in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, row):
+                    le = _label_str(self.labels, key, f'le="{_num(bound)}"')
+                    lines.append(f"{self.name}_bucket{le} {count}")
+                inf = _label_str(self.labels, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{inf} {row[-1]}")
+                lines.append(f"{self.name}_sum{_label_str(self.labels, key)} {_num(row[-2])}")
+                lines.append(f"{self.name}_count{_label_str(self.labels, key)} {row[-1]}")
+        return lines
+
+
+_registry: list = []
+_collectors: list[tuple[str, Callable[[], dict]]] = []
+
+
+def register_collector(prefix: str, fn: Callable[[], dict]) -> None:
+    """
+    fn() -> вложенный dict со статистикой; на /metrics числа станут gauge
+    с именем prefix_<путь>, строки — gauge prefix_<путь>{value="..."} 1.
+    """
+    _collectors.append((prefix, fn))
+
+
+def _flatten(prefix: str, stats: dict) -> Iterator[tuple[str, float | str]]:
+    for key, value in stats.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            yield from _flatten(name, value)
+        elif isinstance(value, bool):
+            yield name, int(value)
+        elif isinstance(value, (int, float)):
+            yield name, value
+        elif isinstance(value, str):
+            yield name, value
+
+
+def render() -> str:
+    lines: list[str] = []
+    for metric in _registry:
+        lines += metric.render()
+    for prefix, fn in _collectors:
+        try:
+            stats = fn()
+        except Exception:
+            continue
+        for name, value in _flatten(prefix, stats):
+            lines.append(f"# TYPE {name} gauge")
+            if isinstance(value, str):
+                lines.append(f'{name}{{value="{_escape(value)}"}} 1')
+            else:
+                lines.append(f"{name} {_num(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# --- Метрики конвейера ---
+
+STAGE_SECONDS = Histogram(
+    "campus_stage_seconds",
+    "Time spent in a pipeline stage (read, prompt, gigachat, extract, normalize, validate).",
+    labels=("stage",),
+)
+LLM_REQUESTS = Counter(
+    "campus_gigachat_requests_total",
+    "HTTP requests to GigaChat chat/completions by kind and status.",
+    labels=("kind", "status"),
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "campus_gigachat_request_seconds",
+    "Latency of a single HTTP request to GigaChat.",
+    labels=("kind",),
+)
+LLM_TOKENS = Counter(
+    "campus_gigachat_tokens_total",
+    "Tokens reported in completion usage.",
+    labels=("type",),
+)
+FALLBACK_ROWS = Counter(
+    "campus_fallback_rows_total",
+    "Rows parsed locally because the GigaChat circuit breaker was open.",
+)
+VALIDATION_FAILURES = Counter(
+    "campus_validation_failures_total",
+    "Rows that did not pass Lesson validation.",
+)
+UPLOADS = Counter(
+    "campus_uploads_total",
+    "Parsed files by status.",
+    labels=("status",),
+)
+
+
+class UploadMetrics:
+    """
+    Сводка по одной загрузке: время по стадиям (сумма по всем строкам и задачам,
+    поэтому при параллельных запросах может быть больше общего времени),
+    число запросов к модели и токены.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: dict[str, list[float]] = {}
+        self.llm_calls = 0
+        self.tokens = {"prompt": 0, "completion": 0, "total": 0}
+        self.validation_failed = 0
+
+    def add_stage(self, stage: str, seconds: float) -> None:
+        row = self.stages.setdefault(stage, [0.0, 0])
+        row[0] += seconds
+        row[1] += 1
+
+    def summary(self) -> dict:
+        return {
+            "wall_seconds": round(time.perf_counter() - self.started, 4),
+            "stages": {
+                stage: {"seconds": round(seconds, 4), "count": count}
+                for stage, (seconds, count) in self.stages.items()
+            },
+            "llm_calls": self.llm_calls,
+            "tokens": dict(self.tokens),
+            "validation_failed": self.validation_failed,
+        }
+
+
+# загрузка, к которой относятся текущие вызовы (наследуется задачами asyncio и to_thread)
+_current: ContextVar[UploadMetrics | None] = ContextVar("campus_upload_metrics", default=None)
+
+
+def current_upload() -> UploadMetrics | None:
+    return _current.get()
+
+
+def bind_upload(upload: UploadMetrics | None):
+    return _current.set(upload)
+
+
+def unbind_upload(token) -> None:
+    try:
+        _current.reset(token)
+    except ValueError:
+        # генератор закрыли из другого контекста — там привязки и не было
+        pass
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    upload = _current.get()
+    if upload is not None:
+        upload.add_stage(stage, seconds)
+
+
+@contextmanager
+def stage(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - t0)
+
+
+def record_llm_request(kind: str, status: str, seconds: float) -> None:
+    LLM_REQUESTS.inc(kind=kind, status=status)
+    LLM_REQUEST_SECONDS.observe(seconds, kind=kind)
+    upload = _current.get()
+    if upload is not None:
+        upload.llm_calls += 1
+
+
+def record_usage(usage) -> None:
+    if not isinstance(usage, dict):
+        return
+    upload = _current.get()
+    for kind in ("prompt", "completion", "total"):
+        n = usage.get(f"{kind}_tokens")
+        if isinstance(n, (int, float)) and n > 0:
+            LLM_TOKENS.inc(n, type=kind)
+            if upload is not None:
+                upload.tokens[kind] += int(n)
+
+
+def record_fallback(rows: int = 1) -> None:
+    FALLBACK_ROWS.inc(rows)
+
+
+def record_validation_failure() -> None:
+    VALIDATION_FAILURES.inc()
+    upload = _current.get()
+    if upload is not None:
+        upload.validation_failed += 1
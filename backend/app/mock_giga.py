@@ -0,0 +1,202 @@
+# backend/app/mock_giga.py
+import sys, json, time, random, uuid, threading, argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Локальная замена GigaChat для бенчмарков: OAuth + chat/completions
+# Запуск отдельно: python backend/app/mock_giga.py --port 8090 --latency-ms 200
+# и GIGACHAT_OAUTH_URL=http://127.0.0.1:8090/api/v2/oauth
+#     GIGACHAT_API_URL=http://127.0.0.1:8090/api/v1/chat/completions
+
+OAUTH_PATH = "/api/v2/oauth"
+CHAT_PATH = "/api/v1/chat/completions"
+
+# Формы ответа модели:
+#   object — чистый JSON;  fenced — JSON в ```json```;  prose — текст вокруг JSON;
+#   short  — в пакетном режиме массив на один элемент короче;  garbage — не JSON
+SHAPES = ("object", "fenced", "prose", "short", "garbage")
+
+
+class MockConfig:
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        shape: str = "object",
+        token_ttl_s: float = 1800.0,
+        seed: int | None = None,
+    ):
+        if shape not in SHAPES:
+            raise ValueError(f"shape must be one of {SHAPES}")
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.shape = shape
+        self.token_ttl_s = token_ttl_s
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {"oauth": 0, "chat": 0, "errors": 0}
+
+
+def _cells(line: str) -> dict:
+    """
+    "... row: a=1 | b=2" -> {"a": "1", "b": "2"} — «модель» просто повторяет ячейки.
+    """
+    _, _, block = line.partition("row:")
+    out = {}
+    for part in block.split("|"):
+        key, sep, val = part.partition("=")
+        if sep and key.strip():
+            out[key.strip()] = val.strip()
+    return out
+
+
+def _row_answer(line: str) -> dict:
+    cells = _cells(line)
+    values = list(cells.values())
+    return {
+        "subject": values[0] if values else "",
+        "start_time": "", "end_time": "",
+        "teacher": values[1] if len(values) > 1 else "",
+        "room": values[2] if len(values) > 2 else "",
+        "weekday": "", "date": "", "group": "", "subgroup": "", "week_type": "", "note": "",
+    }
+
+
+def _content(cfg: MockConfig, system: str, user: str) -> str:
+    if user.startswith("Sheet:") and "Columns:" in user:
+        # разметка колонок: первая колонка — предмет, остальные — по кругу
+        columns = json.loads(user.split("Columns:", 1)[1].splitlines()[0])
+        fields = ["subject", "time", "teacher", "room", "group", "note"]
+        payload = {c: fields[i % len(fields)] for i, c in enumerate(columns)}
+    elif user.startswith("1. "):
+        payload = [_row_answer(line) for line in user.splitlines()]
+        if cfg.shape == "short" and payload:
+            payload = payload[:-1]
+    else:
+        payload = _row_answer(user)
+
+    text = json.dumps(payload, ensure_ascii=False)
+    if cfg.shape == "fenced":
+        return f"```json\n{text}\n```"
+    if cfg.shape == "prose":
+        return f"Вот результат разбора:\n{text}\nГотово."
+    if cfg.shape == "garbage":
+        return "не могу разобрать строку"
+    return text
+
+
+def make_handler(cfg: MockConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # заголовки и тело уходят отдельными write: с Nagle + delayed ACK это ~40 ms на ответ
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, payload: dict, headers: dict | None = None):
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            with cfg.lock:
+                delay = max(0.0, cfg.latency_ms + cfg.random.uniform(-cfg.jitter_ms, cfg.jitter_ms)) / 1000
+                fail = cfg.random.random() < cfg.error_rate
+
+            if self.path == OAUTH_PATH:
+                with cfg.lock:
+                    cfg.counts["oauth"] += 1
+                self._send(200, {
+                    "access_token": uuid.uuid4().hex,
+                    "expires_at": int((time.time() + cfg.token_ttl_s) * 1000),
+                })
+                return
+
+            if self.path != CHAT_PATH:
+                self._send(404, {"message": "not found"})
+                return
+
+            time.sleep(delay)
+            with cfg.lock:
+                cfg.counts["chat"] += 1
+                if fail:
+                    cfg.counts["errors"] += 1
+            if fail:
+                headers = {"Retry-After": "0"} if cfg.error_status == 429 else None
+                self._send(cfg.error_status, {"message": "mock failure"}, headers)
+                return
+
+            req = json.loads(body or b"{}")
+            messages = req.get("messages", [])
+            system = messages[0]["content"] if messages else ""
+            user = messages[-1]["content"] if messages else ""
+            content = _content(cfg, system, user)
+            prompt_tokens = (len(system) + len(user)) // 4
+            completion_tokens = len(content) // 4
+            self._send(200, {
+                "choices": [{"message": {"role": "assistant", "content": content}, "index": 0, "finish_reason": "stop"}],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+                "model": req.get("model", ""),
+                "object": "chat.completion",
+            })
+
+    return Handler
+
+
+class _MockServer(ThreadingHTTPServer):
+    # очередь listen(): при 5 по умолчанию на 16+ параллельных соединениях теряются SYN
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def start_mock_server(host: str = "127.0.0.1", port: int = 0, **config) -> tuple[ThreadingHTTPServer, MockConfig, str]:
+    """
+    Поднимает сервер в фоновом потоке. Возвращает (server, config, base_url).
+    port=0 — любой свободный порт. Остановка: server.shutdown().
+    """
+    cfg = MockConfig(**config)
+    server = _MockServer((host, port), make_handler(cfg))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, cfg, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Mock GigaChat (OAuth + chat/completions)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8090)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--error-status", type=int, default=503)
+    ap.add_argument("--shape", choices=SHAPES, default="object")
+    args = ap.parse_args()
+
+    server, cfg, url = start_mock_server(
+        args.host, args.port,
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, error_status=args.error_status, shape=args.shape,
+    )
+    print(f"mock GigaChat: {url}{OAUTH_PATH} , {url}{CHAT_PATH}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(cfg.counts, file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
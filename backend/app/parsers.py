@@ -1,13 +1,77 @@
+from __future__ import annotations
+
 import os
 import json
-import pandas as pd
+import time
+import asyncio
+import importlib
+import importlib.util
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import re
-from typing import List, Any, Tuple
-from backend.app.giga_client import get_gigachat_token, ask_gigachat_single
+from collections import deque, OrderedDict
+from typing import TYPE_CHECKING, Any, Tuple, AsyncIterator, Iterator
+from backend.app.giga_client import (
+    get_gigachat_token,
+    ask_gigachat_single,
+    ask_gigachat_batch,
+    get_model,
+    get_system_prompt,
+    MAX_CONCURRENCY,
+    BATCH_SIZE,
+    ask_gigachat_columns,
+)
+from .resilience import CircuitOpenError
+from .column_mappings import get_mapping, put_mapping, clean_mapping
+from .llm_cache import CACHE_ENABLED, cache_key, cache_get_many, cache_put
+from .schedule_versions import row_fingerprint
+from .dispatch import FairDispatcher
+from .metrics import (
+    UPLOADS,
+    UploadMetrics,
+    bind_upload,
+    unbind_upload,
+    observe_stage,
+    stage,
+    record_fallback,
+    record_validation_failure,
+)
 from pydantic import BaseModel
-from .mappings import KEY_MAP
+from .mappings import KEY_MAP, week_parity
+from .header_index import match_header
 from pathlib import Path
 
+# pandas/numpy (~0.3 c) грузятся при первом чтении таблицы, а не при импорте:
+# холодный старт сервиса их не ждёт
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Лист без GigaChat: если заголовки раскладываются через KEY_MAP
+LOCAL_BYPASS = os.getenv("GIGACHAT_LOCAL_BYPASS", "true").lower() in ("1", "true", "yes")
+# минимальная доля распознанных колонок (1.0 — все колонки известны)
+BYPASS_THRESHOLD = float(os.getenv("GIGACHAT_BYPASS_THRESHOLD", "1.0"))
+
+# Незнакомый заголовок: размечать колонки моделью раз на лист и разбирать строки локально
+COLUMN_MAPPING = os.getenv("GIGACHAT_COLUMN_MAPPING", "false").lower() in ("1", "true", "yes")
+
+# Одинаковые строки (частый случай: недели, подгруппы) отправлять в модель один раз
+DEDUP_ROWS = os.getenv("GIGACHAT_DEDUP", "true").lower() in ("1", "true", "yes")
+# сколько разных строк помним для дедупликации в пределах файла
+DEDUP_MAX_ROWS = 50000
+
+# Чтение таблиц: движок Excel (auto/calamine/openpyxl/default) и число процессов на листы
+TABLE_READER_ENGINE = os.getenv("TABLE_READER_ENGINE", "auto")
+TABLE_READ_WORKERS = int(os.getenv("TABLE_READ_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# регулярки компилируем один раз: нормализация зовёт их на каждую ячейку
+_FENCE_RE = re.compile(r"^```[a-zA-Z]*\s*|\s*```$")
+_JSON_SPAN_RE = re.compile(r"(\{.*\}|\[.*\])", flags=re.DOTALL)
+_HHMM_RE = re.compile(r"^(\d{1,2})(?::?(\d{1,2}))?$")
+_RANGE_WORD_RE = re.compile(r"^\s*([0-9:\.\-\s]{3,})\s*(?:до|to)\s*([0-9:\.\-\s]{3,})\s*$", flags=re.IGNORECASE)
+_RANGE_DASH_RE = re.compile(r"^\s*([0-9:\.\-\s]{3,})\s*-\s*([0-9:\.\-\s]{3,})\s*$")
+_ISO_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+_ROW_CELLS_RE = re.compile(r"row:\s*(.*)$")
+
 class Lesson(BaseModel):
     subject: str
     start_time: str
@@ -22,43 +86,333 @@ class Lesson(BaseModel):
     note: str = ""
     raw: str
 
+# поля Lesson в порядке model_dump; для обязательных в шаблоне None
+LESSON_FIELDS = tuple(Lesson.model_fields)
+_LESSON_FIELD_SET = frozenset(LESSON_FIELDS)
+_LESSON_REQUIRED = frozenset(name for name, f in Lesson.model_fields.items() if f.is_required())
+_LESSON_TEMPLATE = {name: None if f.is_required() else f.default for name, f in Lesson.model_fields.items()}
+
+def _lesson_fast(obj: dict) -> dict | None:
+    """
+    Lesson(**obj).model_dump() без pydantic для обычного случая: обязательные поля есть,
+    все значения — str. Результат тот же, вплоть до порядка ключей.
+    None — случай необычный, пусть разбирается pydantic.
+    """
+    keys = obj.keys()
+    if not _LESSON_REQUIRED <= keys:
+        return None
+    out = _LESSON_TEMPLATE.copy()
+    out.update({k: obj[k] for k in keys & _LESSON_FIELD_SET})
+    for v in out.values():
+        if type(v) is not str:
+            return None
+    return out
+
+def lessons_to_columns(lessons: list[dict]) -> dict[str, list]:
+    """
+    Список уроков -> {поле: [значения по строкам]} (layout=columnar).
+    Колонки error и fallback появляются, только если в них что-то есть.
+    """
+    columns = {name: [obj.get(name, "") for obj in lessons] for name in LESSON_FIELDS}
+    if any("error" in obj for obj in lessons):
+        columns["error"] = [obj.get("error", "") for obj in lessons]
+    if any(obj.get("fallback") for obj in lessons):
+        columns["fallback"] = [bool(obj.get("fallback")) for obj in lessons]
+    return columns
+
+def _column_parts(series: pd.Series, col: str) -> list[str]:
+    """
+    Колонка -> "col=val" для непустых ячеек, "" для пустых.
+    В расписаниях значения сильно повторяются, поэтому str/strip считаем
+    один раз на уникальное значение и раскладываем обратно по кодам.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) not in ("string", "empty"):
+        # смешанные типы: 1 и 1.0 для factorize равны, а str() у них разный
+        vals = series.fillna("").map(str).str.strip()
+        return (col + "=" + vals).where(vals != "", "").tolist()
+
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    lookup = []
+    for val in uniques:
+        sval = str(val).strip()
+        lookup.append(f"{col}={sval}" if sval else "")
+    lookup.append("")  # код -1 (NaN/None) попадает сюда
+    return np.asarray(lookup, dtype=object)[codes].tolist()
+
 def df_to_rows_with_context(df: pd.DataFrame, sheet_name: str) -> list[str]:
+    """
+    DataFrame -> строки-подсказки "[Sheet: ...] [Header: ...] row: col=val | ...".
+    Чистка ячеек идёт по колонкам целиком, заголовок собирается один раз на лист.
+    """
     cols = [str(c).strip() for c in df.columns]
     header_guess = ", ".join(cols[:12])  # до 12 колонок в подсказку
+    prefix = f"[Sheet: {sheet_name}] [Header: {header_guess}] row: "
+
+    parts_by_col = [_column_parts(df.iloc[:, i], col) for i, col in enumerate(cols)]
+
     rows = []
-    for _, r in df.fillna("").iterrows():
-        parts = []
-        for col, val in zip(cols, r.values):
-            sval = str(val).strip()
-            if sval:
-                parts.append(f"{col}={sval}")
+    for cells in zip(*parts_by_col):
+        parts = [p for p in cells if p]
         if parts:
-            rows.append(f"[Sheet: {sheet_name}] [Header: {header_guess}] row: " + " | ".join(parts))
+            rows.append(prefix + " | ".join(parts))
     return rows
 
-def read_any_table(path: str) -> list[str]:
-    rows: list[str] = []
+def _used_columns(df: pd.DataFrame) -> list[str]:
+    """
+    Названия колонок, в которых есть хоть одно непустое значение
+    (пустые "Unnamed: N" из Excel не должны портить покрытие заголовка).
+    """
+    used = []
+    for i, c in enumerate(df.columns):
+        col = df.iloc[:, i].fillna("").astype(str).str.strip()
+        if (col != "").any():
+            used.append(str(c).strip())
+    return used
+
+_TEXT_EXTS = {".csv", ".tsv", ".txt"}
+
+_read_pool: ProcessPoolExecutor | None = None
+
+def _excel_engine(engine: str | None = None) -> str | None:
+    """
+    Движок чтения Excel для pandas:
+      "auto"     — calamine (Rust, python-calamine), если установлен, иначе выбор pandas;
+      "calamine" / "openpyxl" / ... — явно;
+      "default"  — как раньше, pandas подбирает сам.
+    """
+    engine = (engine or TABLE_READER_ENGINE).lower()
+    if engine == "auto":
+        return "calamine" if importlib.util.find_spec("python_calamine") else None
+    if engine == "default":
+        return None
+    return engine
+
+def _sheet_result(df: pd.DataFrame, sheet: str) -> tuple[str, list[str], list[str]]:
+    rows = df_to_rows_with_context(df, sheet)
+    return sheet, _used_columns(df), [r for r in rows if r.strip()]
+
+def _open_book(path: str, engine: str | None = None):
+    """
+    Открытая книга Excel (pd.ExcelFile): листы читаются из неё без повторного
+    разбора книги (shared strings, метаданные). Для CSV/TSV/TXT — None.
+    """
+    if Path(path).suffix.lower() in _TEXT_EXTS:
+        return None
+
+    # xlsx, xls, xlsm, xlsb и т.п. — pandas сам подберёт движок
+    import pandas as pd
+    try:
+        return pd.ExcelFile(path, engine=_excel_engine(engine))
+    except Exception as e:
+        raise RuntimeError(f"Не удалось открыть файл как Excel: {e}")
+
+def _sheet_names(path: str, book) -> list[str]:
+    if book is None:
+        return [Path(path).suffix.upper().lstrip(".")]
+    return [str(name) for name in book.sheet_names]
+
+def _close_book(book) -> None:
+    if book is not None:
+        book.close()
+
+def _read_frame(path: str, sheet: str, engine: str | None = None, book=None) -> pd.DataFrame:
+    import pandas as pd
+
     ext = Path(path).suffix.lower()
 
     # --- Текстовые таблицы ---
-    if ext in {".csv", ".tsv", ".txt"}:
+    if ext in _TEXT_EXTS:
         # sep=None + engine="python" — автоопределение разделителя
-        df = pd.read_csv(path, dtype=str, sep=None, engine="python")
-        rows += df_to_rows_with_context(df, ext.upper().lstrip("."))
-        return [r for r in rows if r.strip()]
+        return pd.read_csv(path, dtype=str, sep=None, engine="python")
 
     # --- Excel-файлы ---
-    # xlsx, xls, xlsm, xlsb и т.п. — pandas сам подберёт движок
+    if book is not None:
+        return book.parse(sheet, dtype=str)
+    return pd.read_excel(path, sheet_name=sheet, dtype=str, engine=_excel_engine(engine))
+
+def _read_sheet_timed(
+    path: str,
+    sheet: str,
+    engine: str | None = None,
+    book=None,
+) -> tuple[tuple[str, list[str], list[str]], dict]:
+    """
+    read_sheet + время стадий {"read", "prompt"}: в воркере пула метрик процесса нет,
+    поэтому время возвращается вызывающему и записывается уже у него.
+    book — уже открытая книга (_open_book), иначе файл открывается заново.
+    """
+    t0 = time.perf_counter()
+    df = _read_frame(path, sheet, engine, book)
+    t1 = time.perf_counter()
+    result = _sheet_result(df, sheet)
+    return result, {"read": t1 - t0, "prompt": time.perf_counter() - t1}
+
+def _read_sheets_timed(path: str, sheets: list[str], engine: str | None = None) -> list[tuple[tuple[str, list[str], list[str]], dict]]:
+    """
+    Несколько листов из одной открытой книги — задача воркера пула.
+    Открытие книги засчитывается в "read" первого листа.
+    """
+    t0 = time.perf_counter()
+    book = _open_book(path, engine)
+    opened = time.perf_counter() - t0
     try:
-        xls = pd.ExcelFile(path)
-    except Exception as e:
-        raise RuntimeError(f"Не удалось открыть файл как Excel: {e}")
+        out = [_read_sheet_timed(path, sheet, engine, book) for sheet in sheets]
+    finally:
+        _close_book(book)
+    if out:
+        out[0][1]["read"] += opened
+    return out
+
+def _sheet_chunks(sheets: list[str], workers: int) -> list[list[str]]:
+    # подряд идущие листы: каждый воркер открывает книгу один раз, порядок книги сохраняется
+    size = -(-len(sheets) // workers)
+    return [sheets[i:i + size] for i in range(0, len(sheets), size)]
+
+def _observed(timed: tuple[tuple[str, list[str], list[str]], dict]) -> tuple[str, list[str], list[str]]:
+    result, timings = timed
+    for name, seconds in timings.items():
+        observe_stage(name, seconds)
+    return result
 
-    for sheet in xls.sheet_names:
-        df = pd.read_excel(xls, sheet_name=sheet, dtype=str)
-        rows += df_to_rows_with_context(df, sheet)
+def read_sheet(path: str, sheet: str, engine: str | None = None) -> tuple[str, list[str], list[str]]:
+    """
+    Один лист -> (sheet_name, непустые колонки, строки-подсказки).
+    """
+    return _read_sheet_timed(path, sheet, engine)[0]
+
+def list_sheets(path: str, engine: str | None = None) -> list[str]:
+    """
+    Имена листов (для CSV — один псевдо-лист "CSV"/"TSV"/"TXT").
+    """
+    book = _open_book(path, engine)
+    try:
+        return _sheet_names(path, book)
+    finally:
+        _close_book(book)
+
+def warm_up_readers() -> list[str]:
+    """
+    Прогрев на старте: импорт pandas и движка Excel,
+    чтобы первую загрузку не ждали ленивые импорты. Возвращает, что загружено.
+    """
+    import pandas  # noqa: F401
+
+    loaded = ["pandas"]
+    engine = _excel_engine()
+    module = {"calamine": "python_calamine"}.get(engine or "openpyxl", engine or "openpyxl")
+    if importlib.util.find_spec(module):
+        importlib.import_module(module)
+        loaded.append(module)
+    return loaded
+
+def _get_read_pool(workers: int) -> ProcessPoolExecutor:
+    global _read_pool
+    if _read_pool is None:
+        # spawn: форк процесса с живым event loop и потоками httpx небезопасен
+        _read_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _read_pool
+
+def shutdown_read_pool() -> None:
+    global _read_pool
+    if _read_pool is not None:
+        _read_pool.shutdown(cancel_futures=True)
+        _read_pool = None
+
+def iter_table_sheets(
+    path: str,
+    engine: str | None = None,
+    workers: int | None = None,
+) -> Iterator[tuple[str, list[str], list[str]]]:
+    """
+    Листы по одному, в порядке книги: (sheet_name, непустые колонки, строки-подсказки).
+    Книга открывается один раз, листы читаются из неё. При workers > 1
+    (по умолчанию TABLE_READ_WORKERS) листы делятся на workers кусков подряд,
+    куски читаются параллельно в пуле процессов, но отдаются всё равно по порядку.
+    """
+    workers = TABLE_READ_WORKERS if workers is None else workers
+    t0 = time.perf_counter()
+    book = _open_book(path, engine)
+    sheets = _sheet_names(path, book)
+    if workers <= 1 or len(sheets) <= 1:
+        observe_stage("read", time.perf_counter() - t0)
+        try:
+            for sheet in sheets:
+                yield _observed(_read_sheet_timed(path, sheet, engine, book))
+        finally:
+            _close_book(book)
+        return
+    _close_book(book)
+
+    chunks = _sheet_chunks(sheets, workers)
+    pool = _get_read_pool(workers)
+    for chunk in pool.map(_read_sheets_timed, [path] * len(chunks), chunks, [engine] * len(chunks)):
+        for timed in chunk:
+            yield _observed(timed)
+
+async def aiter_table_sheets(
+    path: str,
+    engine: str | None = None,
+    workers: int | None = None,
+) -> AsyncIterator[tuple[str, list[str], list[str]]]:
+    """
+    Асинхронный iter_table_sheets: чтение не блокирует event loop,
+    и разбор первых листов начинается, пока следующие ещё читаются.
+    """
+    loop = asyncio.get_running_loop()
+    workers = TABLE_READ_WORKERS if workers is None else workers
+    t0 = time.perf_counter()
+    book = await asyncio.to_thread(_open_book, path, engine)
+    sheets = _sheet_names(path, book)
+
+    if workers <= 1 or len(sheets) <= 1:
+        observe_stage("read", time.perf_counter() - t0)
+        try:
+            for sheet in sheets:
+                yield _observed(await asyncio.to_thread(_read_sheet_timed, path, sheet, engine, book))
+        finally:
+            _close_book(book)
+        return
+    _close_book(book)
+
+    pool = _get_read_pool(workers)
+    ahead = deque(
+        loop.run_in_executor(pool, _read_sheets_timed, path, chunk, engine)
+        for chunk in _sheet_chunks(sheets, workers)
+    )
+    try:
+        while ahead:
+            for timed in await ahead.popleft():
+                yield _observed(timed)
+    finally:
+        for fut in ahead:
+            fut.cancel()
+
+def read_table_sheets(path: str) -> list[tuple[str, list[str], list[str]]]:
+    """
+    То же, что read_any_table, но по листам:
+    [(sheet_name, непустые колонки, строки-подсказки), ...]
+    """
+    return list(iter_table_sheets(path))
+
+def read_any_table(path: str) -> list[str]:
+    rows: list[str] = []
+    for _, _, sheet_rows in read_table_sheets(path):
+        rows += sheet_rows
+    return rows
 
-    return [r for r in rows if r.strip()]
+def header_coverage(columns: list[str]) -> float:
+    """
+    Доля колонок, которые точно раскладываются через KEY_MAP (после нормализации
+    заголовка, см. header_index). Нечёткие совпадения не считаются: по ним
+    лист без модели не разбираем.
+    """
+    if not columns:
+        return 0.0
+    known = sum(1 for c in columns if _match_key(c)[1] == 1.0)
+    return known / len(columns)
 
 def extract_parsed_from_resp(resp_json: dict) -> Tuple[Any, str]:
     """
@@ -86,7 +440,7 @@ def extract_parsed_from_resp(resp_json: dict) -> Tuple[Any, str]:
 
     raw_text = text
 
-    stripped = re.sub(r"^```[a-zA-Z]*\s*|\s*```$", "", text.strip())
+    stripped = _FENCE_RE.sub("", text.strip())
 
     # Прямая попытка json.loads
     try:
@@ -95,7 +449,7 @@ def extract_parsed_from_resp(resp_json: dict) -> Tuple[Any, str]:
         pass
     
     # Вырежем первую JSON-подстроку {...} или [...]
-    m = re.search(r"(\{.*\}|\[.*\])", stripped, flags=re.DOTALL)
+    m = _JSON_SPAN_RE.search(stripped)
     if m:
         try:
             return json.loads(m.group(1)), raw_text
@@ -112,7 +466,7 @@ def _clean_hhmm(part: str) -> str:
     if not isinstance(part, str):
         return part
     p = part.strip().replace(".", ":").replace("-", ":")
-    m = re.match(r"^(\d{1,2})(?::?(\d{1,2}))?$", p)
+    m = _HHMM_RE.match(p)
     if not m:
         return part.strip()
     hh = int(m.group(1))
@@ -135,11 +489,11 @@ def _split_time_range(s: str) -> tuple[str, str]:
         return "", ""
 
     # Вариант с разделителем-словом: "до"/"to"
-    m = re.match(r"^\s*([0-9:\.\-\s]{3,})\s*(?:до|to)\s*([0-9:\.\-\s]{3,})\s*$", t, flags=re.IGNORECASE)
+    m = _RANGE_WORD_RE.match(t)
     if not m:
         # Нормализуем длинные тире к дефису и парсим как 'лево - право'
         t2 = t.replace("—", "-").replace("–", "-")
-        m = re.match(r"^\s*([0-9:\.\-\s]{3,})\s*-\s*([0-9:\.\-\s]{3,})\s*$", t2)
+        m = _RANGE_DASH_RE.match(t2)
 
     if m:
         a, b = _clean_hhmm(m.group(1)), _clean_hhmm(m.group(2))
@@ -180,16 +534,15 @@ def _normalize_week_type(value: Any) -> str:
 
     low = s.strip().lower()
 
-    # нормализуем основные кейсы
-    if low.startswith("чет"):
-        return "четная"
-    if low.startswith("нечет") or low.startswith("нечёт"):
-        return "нечетная"
+    # нормализуем основные кейсы: "Чётная неделя" -> "четная", "неч." -> "нечетная"
+    parity = week_parity(low)
+    if parity:
+        return parity
     if low in {"оба", "both", "all"}:
         return "оба"
 
     # Excel-даты вида "2016-01-01 00:00:00" — вычищаем или считаем "все недели"
-    if re.match(r"\d{4}-\d{2}-\d{2}", low):
+    if _ISO_DATE_RE.match(low):
         # для MVP можно вернуть пусто или "all"
         return ""  # или "оба"/"all", если так логичнее под твой фронт
 
@@ -202,7 +555,7 @@ def fallback_parse_row_from_prompt(prompt: str) -> dict:
     Возвращает dict с оригинальными именами колонок.
     Потом normalize_parsed сам разрулит их через key_map.
     """
-    m = re.search(r"row:\s*(.*)$", prompt)
+    m = _ROW_CELLS_RE.search(prompt)
     if not m:
         return {}
 
@@ -221,26 +574,30 @@ def fallback_parse_row_from_prompt(prompt: str) -> dict:
 
     return obj
 
-def normalize_parsed(obj: Any, original_row: str) -> dict:
+def _match_key(k: Any) -> tuple[str | None, float]:
+    # точное совпадение — самый частый случай (ключи ответа модели), дальше индекс заголовков
+    key = str(k).strip().lower()
+    field = KEY_MAP.get(key)
+    if field:
+        return field, 1.0
+    return match_header(key)
+
+def _collect_fields(obj: dict, match_key, split_time) -> dict:
     """
-    Приводим ответ модели к единой схеме.
-    Гарантируем поля: subject, start_time, end_time, teacher, room, raw
+    Ключи ответа -> поля Lesson через KEY_MAP + раскладка "time" на начало/конец.
+    Ключ с нечётким совпадением не перетирает поле, заданное точным ключом.
     """
-    out = {"subject": "", "start_time": "", "end_time": "", "teacher": "", "room": "", "raw": original_row}
-    if not isinstance(obj, dict):
-        return out
-
-    key_map = KEY_MAP
-
     tmp = {}
+    confidence = {}
     for k, v in obj.items():
-        k_norm = key_map.get(str(k).strip().lower())
-        if k_norm:
+        k_norm, score = match_key(k)
+        if k_norm and score >= confidence.get(k_norm, 0.0):
             tmp[k_norm] = v
+            confidence[k_norm] = score
 
     # time: "09:00-10:30"
     if isinstance(tmp.get("time"), str):
-        s, e = _split_time_range(tmp["time"])
+        s, e = split_time(tmp["time"])
         if s and not tmp.get("start_time"):
             tmp["start_time"] = s
         if e and not tmp.get("end_time"):
@@ -256,6 +613,19 @@ def normalize_parsed(obj: Any, original_row: str) -> dict:
         if isinstance(en, str):
             tmp.setdefault("end_time",   en)
 
+    return tmp
+
+def normalize_parsed(obj: Any, original_row: str) -> dict:
+    """
+    Приводим ответ модели к единой схеме.
+    Гарантируем поля: subject, start_time, end_time, teacher, room, raw
+    """
+    out = {"subject": "", "start_time": "", "end_time": "", "teacher": "", "room": "", "raw": original_row}
+    if not isinstance(obj, dict):
+        return out
+
+    tmp = _collect_fields(obj, _match_key, _split_time_range)
+
     # прогоняем через чистилку все основные поля
     out["subject"]    = _clean_cell(tmp.get("subject"))
     # для времени НЕ убираем "-" (поэтому strip_punct без дефиса)
@@ -279,77 +649,637 @@ def normalize_parsed(obj: Any, original_row: str) -> dict:
 
     return out
 
-async def parse_table_with_giga(path: str) -> dict:
+def _memoized(fn):
     """
-    CSV/Excel -> строки -> GigaChat -> JSON -> нормализация.
-    Единственный публичный конвейер для backend и тестов.
+    fn с памятью по значению: одинаковые строки ("09:00-10:30", "Иванов")
+    в колонке чистятся один раз. Нехэшируемое (dict/list от модели) — без памяти.
+    """
+    cache: dict = {}
+
+    def call(value):
+        if value is None or type(value) is str:
+            try:
+                return cache[value]
+            except KeyError:
+                result = cache[value] = fn(value)
+                return result
+        return fn(value)
+
+    return call
+
+def _clean_time_cell(value: Any) -> str:
+    # для времени НЕ убираем "-" (поэтому strip_punct без дефиса)
+    s = _clean_cell(value, strip_punct=",; ")
+    return _clean_hhmm(s) if s else s
+
+_PLAIN_FIELDS = ("subject", "teacher", "room", "weekday", "date", "group", "subgroup", "note")
+
+def normalize_parsed_many(objs: list[Any], original_rows: list[str]) -> list[dict]:
+    """
+    normalize_parsed для целого листа/пачки за один проход по колонкам.
+    Регулярки скомпилированы заранее, а каждое уникальное значение
+    (ключ, время, ФИО, тип недели) разбирается один раз.
+    Результат совпадает с [normalize_parsed(o, r) for o, r in zip(objs, original_rows)].
     """
-    rows: List[str] = []
+    match_key = _memoized(_match_key)
+    split_time = _memoized(_split_time_range)
+    clean = _memoized(_clean_cell)
+    clean_time = _memoized(_clean_time_cell)
+    week_type = _memoized(_normalize_week_type)
+
+    tmps = [
+        _collect_fields(obj, match_key, split_time) if isinstance(obj, dict) else None
+        for obj in objs
+    ]
+    present = [tmp for tmp in tmps if tmp is not None]
+
+    # колонки: по списку значений на поле
+    columns = {f: [clean(tmp.get(f)) for tmp in present] for f in _PLAIN_FIELDS}
+    columns["start_time"] = [clean_time(tmp.get("start_time")) for tmp in present]
+    columns["end_time"] = [clean_time(tmp.get("end_time")) for tmp in present]
+    columns["week_type"] = [week_type(tmp.get("week_type")) for tmp in present]
+
+    out: list[dict] = []
+    j = 0
+    for tmp, row in zip(tmps, original_rows):
+        if tmp is None:
+            out.append({"subject": "", "start_time": "", "end_time": "", "teacher": "", "room": "", "raw": row})
+            continue
+        out.append({
+            "subject": columns["subject"][j],
+            "start_time": columns["start_time"][j],
+            "end_time": columns["end_time"][j],
+            "teacher": columns["teacher"][j],
+            "room": columns["room"][j],
+            "raw": row,
+            "weekday": columns["weekday"][j],
+            "date": columns["date"][j],
+            "group": columns["group"][j],
+            "subgroup": columns["subgroup"][j],
+            "week_type": columns["week_type"][j],
+            "note": columns["note"][j],
+        })
+        j += 1
+    return out
+
+def _merge_row(prompt: str, parsed: Any) -> dict:
+    """
+    Ответ модели для строки + локальный разбор строки (колонки файла важнее).
+    """
+    fallback = fallback_parse_row_from_prompt(prompt)  
+
+    merged = {}
+    if parsed:
+        merged.update(parsed)      # сначала LLM
+    if fallback:
+        merged.update(fallback)   
+    return merged
+
+def _validate_lesson(obj: dict, prompt: str) -> dict:
+    fast = _lesson_fast(obj)
+    if fast is not None:
+        return fast
     try:
-        rows = read_any_table(path)
-    except Exception as e:
+        # Гарантируем, что на выходе нормальный Lesson
+        return Lesson(**obj).model_dump()
+    except Exception:
+        # Если что-то совсем поехало — хотя бы вернём raw и ошибку
+        record_validation_failure()
         return {
-            "status": "error",
-            "error": f"file read error: {e}",
-            "file": os.path.basename(path),
+            **obj,
+            "raw": prompt,
+            "error": "validation_failed",
         }
 
-    if not rows:
-        return {
-            "status": "ok",
-            "file": os.path.basename(path),
-            "count": 0,
-            "normalized": [],
-        }
+def _build_lesson(prompt: str, parsed: Any) -> dict:
+    """
+    Ответ модели для строки + локальный разбор строки -> нормализованный Lesson.
+    """
+    with stage("normalize"):
+        obj = normalize_parsed(_merge_row(prompt, parsed), prompt)
+    with stage("validate"):
+        return _validate_lesson(obj, prompt)
+
+def _build_lessons(prompts: list[str], parsed: list[Any]) -> list[dict]:
+    """
+    То же, что _build_lesson, но для многих строк сразу (normalize_parsed_many).
+    Ошибка в одной строке не портит остальные.
+    """
+    if not prompts:
+        return []
+    merged: list[Any] = []
+    errors: dict[int, Exception] = {}
+    with stage("normalize"):
+        for i, (prompt, item) in enumerate(zip(prompts, parsed)):
+            try:
+                merged.append(_merge_row(prompt, item))
+            except Exception as e:
+                errors[i] = e
+                merged.append(None)
+        objs = normalize_parsed_many(merged, prompts)
+
+    with stage("validate"):
+        return [
+            _row_error(prompt, errors[i]) if i in errors else _validate_lesson(obj, prompt)
+            for i, (prompt, obj) in enumerate(zip(prompts, objs))
+        ]
+
+def _row_error(prompt: str, e: Exception) -> dict:
+    return {
+        "raw": prompt,
+        "error": f"{type(e).__name__}: {e}",
+    }
+
+def _row_cache_key(prompt: str) -> str:
+    # ключ одинаковый для поштучного и пакетного режима: ответ на строку тот же
+    return cache_key(get_model(), get_system_prompt(), prompt)
+
+async def _parse_row_with_giga(
+    prompt: str,
+    api_url: str,
+    cache_write: bool = False,
+    report: dict | None = None,
+) -> dict:
+    """
+    Одна строка таблицы -> GigaChat -> нормализованный Lesson.
+    Любая ошибка превращается в {"raw", "error"} и не роняет весь файл.
+    Пока circuit breaker открыт — строка разбирается локально (report["fallback_rows"] += 1)
+    и помечается "fallback": True: такой урок не кэшируется и при следующей загрузке разбирается заново.
+    """
+    try:
+        # токен берём из общего кэша: на длинной загрузке он может обновиться
+        token = await get_gigachat_token()
+        with stage("gigachat"):
+            resp = await ask_gigachat_single(prompt, token, api_url)
+        with stage("extract"):
+            parsed, raw_text = extract_parsed_from_resp(resp)
+        if cache_write and isinstance(parsed, dict):
+            cache_put(_row_cache_key(prompt), parsed)
+        return _build_lesson(prompt, parsed)
+
+    except CircuitOpenError:
+        # API нездоров — не ждём, разбираем по колонкам файла
+        record_fallback()
+        if report is not None:
+            report["fallback_rows"] += 1
+        try:
+            return {**_build_lesson(prompt, None), "fallback": True}
+        except Exception as e:
+            return _row_error(prompt, e)
+
+    except Exception as e:
+        return _row_error(prompt, e)
+
+def _split_batch_reply(parsed: Any, n: int) -> list:
+    """
+    Ответ на пачку -> список объектов по строкам.
+    Принимаем массив или обёртку {"rows": [...]}; для пачки из 1 строки — и голый объект.
+    """
+    if isinstance(parsed, dict):
+        lists = [v for v in parsed.values() if isinstance(v, list)]
+        if len(lists) == 1:
+            parsed = lists[0]
+        elif n == 1:
+            parsed = [parsed]
+    if not isinstance(parsed, list):
+        return []
+    return parsed[:n]
+
+async def _parse_batch_with_giga(
+    prompts: list[str],
+    api_url: str,
+    cache_write: bool = False,
+) -> tuple[list[dict | None], list[int]]:
+    """
+    Пачка строк -> ОДИН запрос к GigaChat -> JSON-массив -> Lesson по каждой строке.
+    Возвращает (results, retry): для строк из retry ответ короткий/битый —
+    их нужно переспросить поштучно, в results на их местах None.
+    """
+    items: list = []
+    try:
+        token = await get_gigachat_token()
+        with stage("gigachat"):
+            resp = await ask_gigachat_batch(prompts, token, api_url)
+        with stage("extract"):
+            parsed, raw_text = extract_parsed_from_resp(resp)
+            items = _split_batch_reply(parsed, len(prompts))
+    except Exception:
+        # весь запрос не удался — пусть каждая строка попробует сама
+        items = []
+
+    results: list[dict | None] = [None] * len(prompts)
+    retry: list[int] = []
+    answered: list[int] = []
+    for i in range(len(prompts)):
+        item = items[i] if i < len(items) else None
+        if isinstance(item, dict) and item:
+            answered.append(i)
+        else:
+            retry.append(i)
 
-    token = await get_gigachat_token()
-    api_url = os.getenv(
+    # нормализуем всю пачку за один проход
+    lessons = _build_lessons([prompts[i] for i in answered], [items[i] for i in answered])
+    for i, obj in zip(answered, lessons):
+        if "error" in obj and obj["error"] != "validation_failed":
+            retry.append(i)
+            continue
+        results[i] = obj
+        if cache_write:
+            cache_put(_row_cache_key(prompts[i]), items[i])
+    retry.sort()
+    return results, retry
+
+def _chat_api_url() -> str:
+    return os.getenv(
         "GIGACHAT_API_URL",
         "https://gigachat.devices.sberbank.ru/api/v1/chat/completions",
     ).strip()
 
-    normalized = []
+async def _sheet_column_mapping(sheet: str, columns: list[str], rows: list[str]) -> tuple[dict | None, str]:
+    """
+    Разметка колонок листа: из хранилища или одним запросом к модели.
+    Возвращает (mapping или None, источник: store / llm / error).
+    Разметка без колонки предмета считается непригодной — лист уйдёт в модель построчно.
+    """
+    mapping = get_mapping(columns)
+    source = "store"
+    if mapping is None:
+        try:
+            token = await get_gigachat_token()
+            with stage("gigachat"):
+                resp = await ask_gigachat_columns(sheet, columns, [r.strip() for r in rows[:3]], token, _chat_api_url())
+            with stage("extract"):
+                parsed, raw_text = extract_parsed_from_resp(resp)
+        except Exception:
+            return None, "error"
+        if not isinstance(parsed, dict):
+            return None, "error"
+        mapping = clean_mapping(columns, parsed)
+        put_mapping(columns, mapping)
+        source = "llm"
+
+    if "subject" not in mapping.values():
+        return None, source
+    return mapping, source
 
-    for prompt in rows:
-        prompt = (prompt or "").strip()
-        if not prompt:
-            continue
+def _apply_column_mapping(prompt: str, mapping: dict[str, str]) -> dict:
+    """
+    Ячейки строки -> {поле Lesson: значение} по разметке колонок.
+    Несколько колонок на одно поле (лектор + практик) склеиваются через запятую.
+    """
+    out: dict[str, str] = {}
+    for col, val in fallback_parse_row_from_prompt(prompt).items():
+        field = mapping.get(col)
+        if field:
+            out[field] = f"{out[field]}, {val}" if field in out else val
+    return out
+
+async def iter_parse_table_with_giga(
+    path: str,
+    max_concurrency: int | None = None,
+    batch_size: int | None = None,
+    local_bypass: bool | None = None,
+    use_cache: bool | None = None,
+    refresh_cache: bool = False,
+    column_mapping: bool | None = None,
+    dedup: bool | None = None,
+    known: dict[int, dict] | None = None,
+    reuse: dict[str, dict] | None = None,
+    dispatch: FairDispatcher | None = None,
+) -> AsyncIterator[dict]:
+    """
+    Потоковая версия конвейера: отдаёт записи по мере готовности, строго в порядке строк.
+      {"type": "sheet",   "sheet", "path", "coverage", "rows"}       — решение по листу
+                                                                     (path: local / mapped / llm)
+      {"type": "lesson",  "index", "done", "total", "lesson"}        — строка (Lesson или {"raw", "error"});
+                                                                     total — строк в уже прочитанных листах
+      {"type": "summary", "status", "file", "count", "sheets", "cache", "dedup", "fallback_rows", "reused", "metrics"}
+                                                                   — последней записью; metrics — время по стадиям,
+                                                                     запросы к модели и токены этой загрузки
+    В полёте держим ограниченное окно строк, так что память не растёт с размером файла.
+    Параметры — как у parse_table_with_giga; known — уже готовые результаты по номеру строки
+    (возобновление задачи), такие строки повторно не разбираются; reuse — готовые уроки
+    по отпечатку строки (прошлая версия расписания), совпавшие строки тоже не разбираются.
+    dispatch — общий на несколько файлов бюджет запросов к модели (вместо своего
+    семафора на max_concurrency); слоты делятся между файлами по кругу.
+    """
+    file_name = os.path.basename(path)
+    if local_bypass is None:
+        local_bypass = LOCAL_BYPASS
+    if use_cache is None:
+        use_cache = CACHE_ENABLED
+    if column_mapping is None:
+        column_mapping = COLUMN_MAPPING
+    if dedup is None:
+        dedup = DEDUP_ROWS
+    max_concurrency = max(1, max_concurrency or MAX_CONCURRENCY)
+    batch_size = max(1, batch_size or BATCH_SIZE)
+    # сколько строк может ждать своей очереди на выдачу
+    window = max_concurrency * batch_size * 2
+
+    total = 0
+    read_error = ""
+    cache_report = {"hits": 0, "misses": 0}
+    dedup_report = {"rows": 0, "duplicates": 0}
+    fallback_report = {"fallback_rows": 0}
+    seen: OrderedDict[str, asyncio.Future] = OrderedDict()  # строка -> результат первой такой строки
+    sheet_report = []
 
+    loop = asyncio.get_running_loop()
+    sem = asyncio.Semaphore(max_concurrency)
+    owner = object()  # этот файл для общего dispatch
+
+    def _slot():
+        return dispatch.slot(owner) if dispatch is not None else sem
+    api_url = ""
+    pending: deque[asyncio.Future] = deque()        # результаты строк в порядке файла
+    batch_buf: list[tuple[str, asyncio.Future]] = []  # строки для модели, ещё не отправленные
+    tasks: set[asyncio.Task] = set()
+    known = known or {}
+    reuse = reuse or {}
+    reused = 0
+    row_idx = 0
+    done = 0
+
+    async def _bounded(prompt: str) -> dict:
+        async with _slot():
+            return await _parse_row_with_giga(prompt, api_url, cache_write=use_cache, report=fallback_report)
+
+    async def _run_batch(chunk: list[tuple[str, asyncio.Future]]) -> None:
+        prompts = [prompt for prompt, _ in chunk]
         try:
-            resp = await ask_gigachat_single(prompt, token, api_url)
-            parsed, raw_text = extract_parsed_from_resp(resp)
+            if len(chunk) == 1:
+                results = [await _bounded(prompts[0])]
+            else:
+                async with _slot():
+                    results, retry = await _parse_batch_with_giga(prompts, api_url, cache_write=use_cache)
+                if retry:
+                    # переспрашиваем только пострадавшие строки
+                    singles = await asyncio.gather(*(_bounded(prompts[i]) for i in retry))
+                    for i, obj in zip(retry, singles):
+                        results[i] = obj
+        except Exception as e:
+            results = [_row_error(prompt, e) for prompt in prompts]
+        for (_, fut), obj in zip(chunk, results):
+            if not fut.done():
+                fut.set_result(obj)
+
+    def _fan_out(src: asyncio.Future, fut: asyncio.Future) -> None:
+        # у каждой позиции свой dict (и свой raw), а не общий объект
+        def _copy(f: asyncio.Future) -> None:
+            if not fut.done():
+                fut.set_result(dict(f.result()))
+        if src.done():
+            _copy(src)
+        else:
+            src.add_done_callback(_copy)
 
-            fallback = fallback_parse_row_from_prompt(prompt)  
+    def _flush() -> None:
+        chunk = batch_buf[:]
+        batch_buf.clear()
+        task = asyncio.create_task(_run_batch(chunk))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
 
-            merged = {}
-            if parsed:
-                merged.update(parsed)      # сначала LLM
-            if fallback:
-                merged.update(fallback)   
-            obj = normalize_parsed(merged, prompt)
+    def _lesson_record(obj: dict) -> dict:
+        nonlocal done
+        done += 1
+        return {"type": "lesson", "index": done - 1, "done": done, "total": total, "lesson": obj}
 
+    # всё, что посчитают стадии ниже (и задачи, созданные отсюда), пишется в upload_metrics
+    upload_metrics = UploadMetrics()
+    metrics_token = bind_upload(upload_metrics)
+
+    # листы читаются в фоне (TABLE_READ_WORKERS), строки уходят в модель сразу
+    sheets = aiter_table_sheets(path)
+    try:
+        while True:
             try:
-                # Гарантируем, что на выходе нормальный Lesson
-                obj = Lesson(**obj).model_dump()
-            except Exception:
-                # Если что-то совсем поехало — хотя бы вернём raw и ошибку
-                obj = {
-                    **obj,
-                    "raw": prompt,
-                    "error": "validation_failed",
+                sheet, columns, sheet_rows = await anext(sheets)
+            except StopAsyncIteration:
+                break
+            except Exception as e:
+                read_error = f"file read error: {e}"
+                break
+
+            total += len(sheet_rows)
+            coverage = header_coverage(columns)
+            local = local_bypass and coverage >= BYPASS_THRESHOLD
+            report = {
+                "sheet": sheet,
+                "path": "local" if local else "llm",
+                "coverage": round(coverage, 3),
+                "rows": len(sheet_rows),
+            }
+
+            # заголовок незнаком — один запрос на лист вместо запроса на строку
+            mapping = None
+            if not local and column_mapping and sheet_rows:
+                mapping, report["mapping"] = await _sheet_column_mapping(sheet, columns, sheet_rows)
+                if mapping:
+                    local = True
+                    report["path"] = "mapped"
+
+            sheet_report.append(report)
+            yield {"type": "sheet", **report}
+
+            # ответы из кэша — одним запросом на лист и не в event loop,
+            # уроки из них собираются сразу пачкой (_build_lessons)
+            cached_rows: dict[str, dict] = {}
+            if not local and use_cache and not refresh_cache:
+                lookup = {
+                    prompt: _row_cache_key(prompt)
+                    for i, prompt in enumerate(p.strip() for p in sheet_rows)
+                    if row_idx + i not in known and not (reuse and row_fingerprint(prompt) in reuse)
                 }
+                found = await asyncio.to_thread(cache_get_many, list(lookup.values()))
+                hits = [prompt for prompt, key in lookup.items() if key in found]
+                cached_rows = dict(zip(hits, _build_lessons(hits, [found[lookup[p]] for p in hits])))
 
-            normalized.append(obj)
+            # локальный лист нормализуем целиком, по колонкам
+            local_lessons = []
+            if local:
+                prompts = [p.strip() for p in sheet_rows]
+                parsed = [_apply_column_mapping(p, mapping) for p in prompts] if mapping else [None] * len(prompts)
+                local_lessons = _build_lessons(prompts, parsed)
 
-        except Exception as e:
-            normalized.append({
-                "raw": prompt,
-                "error": f"{type(e).__name__}: {e}",
-            })
+            for i, prompt in enumerate(sheet_rows):
+                prompt = prompt.strip()
+                fut = loop.create_future()
+                pending.append(fut)
+                idx = row_idx
+                row_idx += 1
+
+                if idx in known:
+                    fut.set_result(known[idx])
+                elif local:
+                    fut.set_result(local_lessons[i])
+                elif reuse and (prev := reuse.get(row_fingerprint(prompt))) is not None:
+                    # строка не изменилась с прошлой загрузки расписания
+                    reused += 1
+                    fut.set_result(dict(prev))
+                elif dedup and prompt in seen:
+                    # такая же строка уже разбирается — ждём её результат
+                    dedup_report["rows"] += 1
+                    dedup_report["duplicates"] += 1
+                    seen.move_to_end(prompt)
+                    _fan_out(seen[prompt], fut)
+                else:
+                    if dedup:
+                        dedup_report["rows"] += 1
+                        seen[prompt] = fut
+                        if len(seen) > DEDUP_MAX_ROWS:
+                            seen.popitem(last=False)
+                    cached = None
+                    if use_cache and not refresh_cache:
+                        cached = cached_rows.get(prompt)
+                        cache_report["hits" if cached is not None else "misses"] += 1
+                    if cached is not None:
+                        fut.set_result(dict(cached))
+                    else:
+                        if not api_url:
+                            # заодно проверяем доступ к OAuth до рассылки строк
+                            await get_gigachat_token()
+                            api_url = _chat_api_url()
+                        batch_buf.append((prompt, fut))
+                        if len(batch_buf) >= batch_size:
+                            _flush()
+
+                # готовое в голове очереди отдаём сразу
+                while pending and pending[0].done():
+                    yield _lesson_record(pending.popleft().result())
+                # окно заполнено — ждём самую старую строку
+                while len(pending) > window:
+                    if not pending[0].done() and batch_buf:
+                        _flush()
+                    yield _lesson_record(await pending.popleft())
+
+        if not read_error:
+            if batch_buf:
+                _flush()
+            while pending:
+                yield _lesson_record(await pending.popleft())
+    finally:
+        # клиент ушёл посреди потока — не оставляем висящие запросы
+        for task in tasks:
+            task.cancel()
+        await sheets.aclose()
+        unbind_upload(metrics_token)
+
+    if read_error:
+        UPLOADS.inc(status="error")
+        yield {
+            "type": "summary",
+            "status": "error",
+            "error": read_error,
+            "file": file_name,
+        }
+        return
+
+    UPLOADS.inc(status="ok")
+    yield {
+        "type": "summary",
+        "status": "ok",
+        "file": file_name,
+        "count": total,
+        "sheets": sheet_report,
+        "cache": cache_report,
+        "dedup": {
+            **dedup_report,
+            "duplicate_ratio": round(dedup_report["duplicates"] / dedup_report["rows"], 4)
+            if dedup_report["rows"] else 0.0,
+        },
+        **fallback_report,
+        "reused": reused,
+        "metrics": upload_metrics.summary(),
+    }
+
+async def parse_table_with_giga(
+    path: str,
+    max_concurrency: int | None = None,
+    batch_size: int | None = None,
+    local_bypass: bool | None = None,
+    use_cache: bool | None = None,
+    refresh_cache: bool = False,
+    column_mapping: bool | None = None,
+    dedup: bool | None = None,
+    reuse: dict[str, dict] | None = None,
+    dispatch: FairDispatcher | None = None,
+) -> dict:
+    """
+    CSV/Excel -> строки -> GigaChat -> JSON -> нормализация.
+    Единственный публичный конвейер для backend и тестов.
+
+    Строки уходят в модель параллельно, но не больше max_concurrency
+    (по умолчанию GIGACHAT_MAX_CONCURRENCY) запросов одновременно.
+    При batch_size > 1 (по умолчанию GIGACHAT_BATCH_SIZE) строки упаковываются
+    по batch_size в один запрос; строки, на которые пачка не ответила, переспрашиваются поштучно.
+    Если local_bypass (по умолчанию GIGACHAT_LOCAL_BYPASS) и заголовок листа покрыт KEY_MAP
+    не меньше чем на GIGACHAT_BYPASS_THRESHOLD — лист разбирается локально, без GigaChat.
+    Ответы модели кэшируются на диске (use_cache, по умолчанию GIGACHAT_CACHE);
+    refresh_cache=True не читает кэш, а перезаписывает записи для строк этого файла.
+    При column_mapping (по умолчанию GIGACHAT_COLUMN_MAPPING) незнакомый заголовок
+    размечается моделью один раз на лист, разметка запоминается, а строки разбираются локально.
+    При dedup (по умолчанию GIGACHAT_DEDUP) одинаковые строки уходят в модель один раз,
+    результат копируется на все их позиции; доля повторов — в "dedup".
+    В "metrics" — время по стадиям (read, prompt, gigachat, extract, normalize, validate),
+    число запросов к модели и токены из usage; то же копится в /metrics.
+    reuse — уроки прошлой версии расписания по отпечатку строки (schedule_versions):
+    неизменённые строки берутся оттуда, их число — в "reused".
+    dispatch — общий бюджет запросов, если разбирается сразу несколько файлов.
+    Порядок normalized совпадает с порядком строк в файле.
+    Собирает результат из iter_parse_table_with_giga.
+    """
+    normalized: list[dict] = []
+    summary: dict = {}
+    async for record in iter_parse_table_with_giga(
+        path,
+        max_concurrency=max_concurrency,
+        batch_size=batch_size,
+        local_bypass=local_bypass,
+        use_cache=use_cache,
+        refresh_cache=refresh_cache,
+        column_mapping=column_mapping,
+        dedup=dedup,
+        reuse=reuse,
+        dispatch=dispatch,
+    ):
+        if record["type"] == "lesson":
+            normalized.append(record["lesson"])
+        elif record["type"] == "summary":
+            summary = record
+
+    return result_from_summary(path, summary, normalized)
+
+def result_from_summary(path: str, summary: dict, normalized: list[dict]) -> dict:
+    """
+    Итоговая запись конвейера + собранные уроки -> результат parse_table_with_giga.
+    Тем же видом сохраняют результат фоновые задачи (jobs).
+    """
+    if summary.get("status") != "ok":
+        return {
+            "status": "error",
+            "error": summary.get("error", "pipeline stopped"),
+            "file": os.path.basename(path),
+        }
+
+    if not normalized:
+        return {
+            "status": "ok",
+            "file": summary["file"],
+            "count": 0,
+            "normalized": [],
+        }
 
     return {
         "status": "ok",
-        "file": os.path.basename(path),
-        "count": len(rows),
+        "file": summary["file"],
+        "count": summary["count"],
         "normalized": normalized,
+        "sheets": summary["sheets"],
+        "cache": summary["cache"],
+        "dedup": summary["dedup"],
+        "fallback_rows": summary["fallback_rows"],
+        "reused": summary["reused"],
+        "metrics": summary["metrics"],
     }
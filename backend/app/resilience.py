@@ -0,0 +1,171 @@
+# backend/app/resilience.py
+import os
+import time
+import random
+import asyncio
+from email.utils import parsedate_to_datetime
+
+# Защита GigaChat и нас самих: общий лимит запросов, повторы с backoff, circuit breaker
+RATE_LIMIT_RPS = float(os.getenv("GIGACHAT_RATE_LIMIT", "10"))      # 0 — без лимита
+RATE_BURST = int(os.getenv("GIGACHAT_RATE_BURST", str(max(1, int(RATE_LIMIT_RPS)))))
+MAX_RETRIES = int(os.getenv("GIGACHAT_MAX_RETRIES", "3"))
+BACKOFF_BASE_S = float(os.getenv("GIGACHAT_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX_S = float(os.getenv("GIGACHAT_BACKOFF_MAX", "30"))
+BREAKER_THRESHOLD = int(os.getenv("GIGACHAT_BREAKER_THRESHOLD", "5"))
+BREAKER_RESET_S = float(os.getenv("GIGACHAT_BREAKER_RESET", "30"))
+
+# на эти коды есть смысл повторить запрос
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    API считается нездоровым — запрос даже не отправляем.
+    """
+
+
+class TokenBucket:
+    """
+    Token bucket: rate запросов в секунду, до burst подряд.
+    Один на процесс — делится между всеми загрузками.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    async def acquire(self) -> float:
+        """
+        Ждёт свободный токен. Возвращает время ожидания (сек).
+        """
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                break
+            delay = (1 - self.tokens) / self.rate
+            waited += delay
+            await asyncio.sleep(delay)
+        if waited:
+            self.waits += 1
+            self.wait_seconds += waited
+        return waited
+
+    def stats(self) -> dict:
+        return {
+            "rate": self.rate,
+            "burst": self.capacity,
+            "waits": self.waits,
+            "wait_seconds": round(self.wait_seconds, 3),
+        }
+
+
+class CircuitBreaker:
+    """
+    closed -> (threshold неудач подряд) -> open -> (reset_timeout) -> half_open:
+    пропускаем один пробный запрос; успех закрывает, неудача снова открывает.
+    """
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = max(1, threshold)
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.opened_total = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+            self.probe_in_flight = False
+        if self.state == "closed":
+            return True
+        if self.state == "half_open" and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self.probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.probe_in_flight = False
+        if self.state == "half_open" or self.failures >= self.threshold:
+            if self.state != "open":
+                self.opened_total += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def abandon(self) -> None:
+        # пробный запрос не дошёл до результата (отмена) — пусть попробует следующий
+        self.probe_in_flight = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "opened_total": self.opened_total,
+            "rejected": self.rejected,
+        }
+
+
+rate_limiter = TokenBucket(RATE_LIMIT_RPS, RATE_BURST)
+breaker = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_RESET_S)
+_retry_stats = {"retries": 0, "retry_sleep_seconds": 0.0, "gave_up": 0}
+
+
+def retry_after_seconds(value: str | None) -> float | None:
+    """
+    Retry-After: число секунд или HTTP-дата.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, retry_after: float | None = None) -> float:
+    """
+    Пауза перед повтором attempt (с 0): Retry-After, если сервер его прислал,
+    иначе экспонента с full jitter, не больше GIGACHAT_BACKOFF_MAX.
+    """
+    if retry_after is not None:
+        delay = min(retry_after, BACKOFF_MAX_S)
+    else:
+        delay = random.uniform(0, min(BACKOFF_MAX_S, BACKOFF_BASE_S * (2 ** attempt)))
+    _retry_stats["retries"] += 1
+    _retry_stats["retry_sleep_seconds"] += delay
+    return delay
+
+
+def record_gave_up() -> None:
+    _retry_stats["gave_up"] += 1
+
+
+def resilience_stats() -> dict:
+    return {
+        "rate_limiter": rate_limiter.stats(),
+        "breaker": breaker.stats(),
+        "retries": {**_retry_stats, "retry_sleep_seconds": round(_retry_stats["retry_sleep_seconds"], 3)},
+    }
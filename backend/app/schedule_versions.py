@@ -0,0 +1,176 @@
+# backend/app/schedule_versions.py
+import json
+import time
+import hashlib
+import threading
+from difflib import SequenceMatcher
+from pathlib import Path
+
+from .storage import connect
+
+# Последняя версия каждого расписания: отпечатки строк и готовые уроки.
+# Повторная загрузка того же расписания разбирает только новые/изменённые строки.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS schedules (
+    key        TEXT PRIMARY KEY,
+    file       TEXT NOT NULL,
+    sha256     TEXT NOT NULL,
+    version    INTEGER NOT NULL,
+    rows       INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS schedule_rows (
+    key         TEXT NOT NULL,
+    idx         INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    lesson      TEXT NOT NULL,
+    PRIMARY KEY (key, idx)
+);
+"""
+
+_lock = threading.Lock()
+
+
+def _db():
+    return connect("schedules.sqlite3", _SCHEMA)
+
+
+def schedule_key(name: str) -> str:
+    """
+    Ключ расписания: имя файла (или группы) без регистра и пробелов по краям.
+    """
+    return Path(str(name)).name.strip().lower()
+
+
+def archive_member_key(archive: str, member: str) -> str:
+    """
+    Ключ расписания для файла из ZIP: имя архива + путь внутри него.
+    "dept/A/расписание.xlsx" и "dept/B/расписание.xlsx" — разные расписания,
+    а повторная загрузка того же архива попадает в те же ключи.
+    """
+    return f"{schedule_key(archive)}/{member.strip().lower()}"
+
+
+def row_fingerprint(prompt: str) -> str:
+    return hashlib.sha1(prompt.strip().encode("utf-8")).hexdigest()
+
+
+def get_version(key: str) -> dict | None:
+    """
+    {"version", "file", "sha256", "fingerprints", "lessons"} или None, если расписания ещё нет.
+    """
+    with _lock:
+        db = _db()
+        head = db.execute("SELECT file, sha256, version FROM schedules WHERE key = ?", (key,)).fetchone()
+        if head is None:
+            return None
+        rows = db.execute(
+            "SELECT fingerprint, lesson FROM schedule_rows WHERE key = ? ORDER BY idx", (key,)
+        ).fetchall()
+    return {
+        "version": head[2],
+        "file": head[0],
+        "sha256": head[1],
+        "fingerprints": [fp for fp, _ in rows],
+        "lessons": [json.loads(lesson) for _, lesson in rows],
+    }
+
+
+def lesson_fingerprints(lessons) -> list[str]:
+    return [row_fingerprint(obj.get("raw", "")) for obj in lessons]
+
+
+def save_version(key: str, file: str, sha256: str, lessons, fingerprints: list[str] | None = None) -> int:
+    """
+    Заменяет сохранённую версию расписания. Возвращает номер новой версии.
+    lessons читаются один раз; fingerprints — если уже посчитаны (lesson_fingerprints).
+    """
+    if fingerprints is None:
+        fingerprints = lesson_fingerprints(lessons)
+    with _lock:
+        db = _db()
+        row = db.execute("SELECT version FROM schedules WHERE key = ?", (key,)).fetchone()
+        version = (row[0] if row else 0) + 1
+        with db:
+            db.execute("DELETE FROM schedule_rows WHERE key = ?", (key,))
+            db.executemany(
+                "INSERT INTO schedule_rows (key, idx, fingerprint, lesson) VALUES (?, ?, ?, ?)",
+                (
+                    (key, i, fp, json.dumps(obj, ensure_ascii=False))
+                    for i, (fp, obj) in enumerate(zip(fingerprints, lessons))
+                ),
+            )
+            db.execute(
+                "INSERT OR REPLACE INTO schedules (key, file, sha256, version, rows, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, file, sha256, version, len(fingerprints), time.time()),
+            )
+    return version
+
+
+def delete_version(key: str) -> bool:
+    with _lock:
+        db = _db()
+        with db:
+            db.execute("DELETE FROM schedule_rows WHERE key = ?", (key,))
+            n = db.execute("DELETE FROM schedules WHERE key = ?", (key,)).rowcount
+    return n > 0
+
+
+def reusable_rows(previous: dict | None) -> dict[str, dict]:
+    """
+    Отпечаток строки -> урок из прошлой версии. Строки с ошибкой и разобранные
+    локально при недоступной модели (fallback) не переиспользуем — пусть разбираются заново.
+    """
+    if not previous:
+        return {}
+    return {
+        fp: obj
+        for fp, obj in zip(previous["fingerprints"], previous["lessons"])
+        if "error" not in obj and not obj.get("fallback")
+    }
+
+
+def diff_versions(previous: dict | None, new_fps: list[str]) -> dict | None:
+    """
+    Прошлая версия vs новый результат, по отпечаткам строк (lesson_fingerprints;
+    difflib, в порядке файла).
+    Новые уроки уже лежат в normalized, поэтому на них только ссылаемся по номеру:
+      added     — [index]                               строки, которых не было
+      removed   — [{"previous_index", "lesson"}]        строки, которых больше нет
+      changed   — [{"index", "previous_index", "before"}] строка на том же месте, но другая
+      unchanged — сколько строк совпало
+    Первой версии сравнивать не с чем — None.
+    """
+    if previous is None:
+        return None
+    old_fps = previous["fingerprints"]
+    old_lessons = previous["lessons"]
+
+    added, removed, changed = [], [], []
+    unchanged = 0
+    matcher = SequenceMatcher(None, old_fps, new_fps, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            unchanged += i2 - i1
+            continue
+        # replace: попарно — «изменённые», хвост — добавленные или удалённые
+        paired = min(i2 - i1, j2 - j1) if tag == "replace" else 0
+        for k in range(paired):
+            changed.append({
+                "index": j1 + k,
+                "previous_index": i1 + k,
+                "before": old_lessons[i1 + k],
+            })
+        for i in range(i1 + paired, i2):
+            removed.append({"previous_index": i, "lesson": old_lessons[i]})
+        for j in range(j1 + paired, j2):
+            added.append(j)
+
+    return {
+        "previous_version": previous["version"],
+        "added": added,
+        "removed": removed,
+        "changed": changed,
+        "unchanged": unchanged,
+    }
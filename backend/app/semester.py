@@ -0,0 +1,181 @@
+# backend/app/semester.py
+import os
+import re
+import hashlib
+from datetime import date, datetime, timedelta, timezone
+from collections import defaultdict
+from typing import Iterable, Iterator
+
+from .conflicts import lesson_interval, pair_number
+from .mappings import PARITIES, weekday_number, week_parity
+
+# Развёртка недельного расписания в даты семестра (не путать с stdlib calendar)
+# тип первой учебной недели; дальше недели чередуются
+FIRST_WEEK_TYPE = week_parity(os.getenv("SEMESTER_FIRST_WEEK", "нечетная")) or PARITIES[1]
+
+_DOTTED_DATE_RE = re.compile(r"^(\d{1,2})\.(\d{1,2})\.(\d{4})$")
+
+
+def parse_date(value) -> date | None:
+    """
+    "2024-09-02", "2024-09-02 00:00:00" (Excel) или "02.09.2024" -> date.
+    """
+    s = str(value or "").strip()
+    if not s:
+        return None
+    m = _DOTTED_DATE_RE.match(s)
+    try:
+        if m:
+            return date(int(m.group(3)), int(m.group(2)), int(m.group(1)))
+        return date.fromisoformat(s[:10])
+    except ValueError:
+        return None
+
+
+# начало семестра по умолчанию (для /lessons?date=...), например 2024-09-02
+SEMESTER_START = parse_date(os.getenv("SEMESTER_START"))
+
+
+def week_type_on(day: date, semester_start: date) -> str:
+    """
+    "четная" / "нечетная" для недели, в которую попадает day.
+    Недели считаются с понедельника недели начала семестра.
+    """
+    weeks = ((day - timedelta(days=day.weekday())) - (semester_start - timedelta(days=semester_start.weekday()))).days // 7
+    other = PARITIES[0] if FIRST_WEEK_TYPE == PARITIES[1] else PARITIES[1]
+    return FIRST_WEEK_TYPE if weeks % 2 == 0 else other
+
+
+def _occurrence(item: tuple, day: date, week_type: str) -> dict:
+    ref, obj, start, end, _ = item
+    return {
+        **{k: v for k, v in obj.items() if k != "raw"},
+        **ref,
+        "date": day.isoformat(),
+        "week_type": week_type,
+        "pair": pair_number(start),
+        "start": f"{day.isoformat()}T{start // 60:02d}:{start % 60:02d}",
+        "end": f"{day.isoformat()}T{end // 60:02d}:{end % 60:02d}",
+    }
+
+
+def iter_occurrences(
+    lessons: Iterable[tuple[dict, dict]],
+    semester_start: date,
+    semester_end: date,
+    window_start: date | None = None,
+    window_end: date | None = None,
+) -> Iterator[dict]:
+    """
+    Занятия по датам: генератор, день за днём, внутри дня — по времени начала.
+    lessons — пары (ссылка на урок, например {"schedule", "index"}, урок).
+    Недельный урок повторяется по своему дню недели с учётом чётности недели
+    (тип недели, отличный от четная/нечетная, — каждую неделю),
+    урок с датой — только в эту дату. Весь семестр в памяти не строится:
+    хранится лишь индекс уроков по дню недели.
+    Окно [window_start, window_end] сужает выдачу внутри семестра.
+    """
+    by_weekday: dict[int, list[tuple]] = defaultdict(list)
+    by_date: dict[date, list[tuple]] = defaultdict(list)
+    for ref, obj in lessons:
+        if "error" in obj:
+            continue
+        span = lesson_interval(obj.get("start_time"), obj.get("end_time"))
+        if span is None:
+            continue
+        fixed = parse_date(obj.get("date"))
+        if fixed is not None:
+            by_date[fixed].append((ref, obj, span[0], span[1], True))
+            continue
+        weekday = weekday_number(obj.get("weekday"))
+        if weekday:
+            by_weekday[weekday].append((ref, obj, span[0], span[1], False))
+    for items in (*by_weekday.values(), *by_date.values()):
+        items.sort(key=lambda item: item[2])
+
+    day = max(semester_start, window_start or semester_start)
+    last = min(semester_end, window_end or semester_end)
+    while day <= last:
+        week_type = week_type_on(day, semester_start)
+        todays = by_weekday.get(day.isoweekday(), ())
+        if day in by_date:
+            todays = sorted((*todays, *by_date[day]), key=lambda item: item[2])
+        for item in todays:
+            wt = week_parity(item[1].get("week_type"))
+            # у урока с датой чётность недели уже не важна; "оба", "1-16" и т.п. — каждую неделю
+            if item[4] or not wt or wt == week_type:
+                yield _occurrence(item, day, week_type)
+        day += timedelta(days=1)
+
+
+# --- iCalendar (RFC 5545) ---
+
+def _ics_escape(value) -> str:
+    return (
+        str(value or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\n", "\\n")
+    )
+
+
+def _ics_line(line: str) -> str:
+    """
+    Строки длиннее 75 октетов переносятся (продолжение начинается с пробела).
+    """
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return line + "\r\n"
+    parts, chunk = [], ""
+    for ch in line:
+        limit = 75 if not parts else 74
+        if len((chunk + ch).encode("utf-8")) > limit:
+            parts.append(chunk)
+            chunk = ""
+        chunk += ch
+    parts.append(chunk)
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _ics_time(value: str) -> str:
+    # "2024-09-02T08:30" -> "20240902T083000" (местное «плавающее» время)
+    return value.replace("-", "").replace(":", "") + "00"
+
+
+def iter_ics(occurrences: Iterable[dict], name: str = "Расписание") -> Iterator[str]:
+    """
+    Занятия -> строки iCalendar, по событию за раз.
+    """
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    yield _ics_line("BEGIN:VCALENDAR")
+    yield _ics_line("VERSION:2.0")
+    yield _ics_line("PRODID:-//Campus Schedule Uploader//RU")
+    yield _ics_line("CALSCALE:GREGORIAN")
+    yield _ics_line(f"X-WR-CALNAME:{_ics_escape(name)}")
+    for occ in occurrences:
+        uid_src = f"{occ.get('schedule', '')}|{occ.get('index', '')}|{occ['start']}|{occ.get('subject', '')}"
+        uid = hashlib.sha1(uid_src.encode("utf-8")).hexdigest()
+        summary = occ.get("subject", "")
+        if occ.get("group"):
+            summary = f"{summary} ({occ['group']})"
+        details = [
+            f"Пара {occ['pair']}" if occ.get("pair") else "",
+            occ.get("teacher", ""),
+            occ.get("week_type", ""),
+            occ.get("note", ""),
+        ]
+        lines = [
+            "BEGIN:VEVENT",
+            f"UID:{uid}@campus",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART:{_ics_time(occ['start'])}",
+            f"DTEND:{_ics_time(occ['end'])}",
+            f"SUMMARY:{_ics_escape(summary)}",
+        ]
+        if occ.get("room"):
+            lines.append(f"LOCATION:{_ics_escape(occ['room'])}")
+        lines.append(f"DESCRIPTION:{_ics_escape(chr(10).join(d for d in details if d))}")
+        lines.append("END:VEVENT")
+        yield "".join(_ics_line(line) for line in lines)
+    yield _ics_line("END:VCALENDAR")
@@ -0,0 +1,36 @@
+# backend/app/storage.py
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+# Локальные SQLite-базы сервиса (кэши, задачи, сохранённые расписания)
+DATA_DIR = Path(os.getenv("CAMPUS_DATA_DIR", "data"))
+
+_lock = threading.Lock()
+_connections: dict[str, sqlite3.Connection] = {}
+
+
+def connect(name: str, schema: str = "") -> sqlite3.Connection:
+    """
+    Одно соединение на файл базы на весь процесс.
+    schema — CREATE TABLE/INDEX IF NOT EXISTS, выполняется при первом открытии.
+    """
+    with _lock:
+        conn = _connections.get(name)
+        if conn is None:
+            DATA_DIR.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(DATA_DIR / name, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if schema:
+                conn.executescript(schema)
+            _connections[name] = conn
+        return conn
+
+
+def close_all() -> None:
+    with _lock:
+        for conn in _connections.values():
+            conn.close()
+        _connections.clear()
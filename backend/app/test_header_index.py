@@ -0,0 +1,79 @@
+# backend/app/test_header_index.py
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+from backend.app.header_index import match_header
+from backend.app.parsers import (
+    _merge_row,
+    header_coverage,
+    normalize_parsed,
+    normalize_parsed_many,
+)
+
+
+@pytest.mark.parametrize("header, field", [
+    ("Преподаватель:", "teacher"),
+    ("ФИО  преподавателя", "teacher"),
+    ("Ауд", "room"),
+    ("Time (start)", "start_time"),
+    ("Начало пары", "start_time"),
+])
+def test_exact_after_normalization(header, field):
+    assert match_header(header) == (field, 1.0)
+
+
+@pytest.mark.parametrize("header, field", [
+    ("Преподаватели", "teacher"),
+    ("Аудитор", "room"),
+    ("Время занят.", "time"),
+    ("Тип нед.", "week_type"),
+])
+def test_fuzzy_below_exact(header, field):
+    got, score = match_header(header)
+    assert got == field
+    assert 0.8 <= score < 1.0
+
+
+@pytest.mark.parametrize("header", [
+    "ФИО студента",
+    "Место работы",
+    "Начало семестра",
+    "Неделя начала",
+    "Day off",
+    "Группа студентов",
+])
+def test_extra_words_do_not_match(header):
+    assert match_header(header)[0] is None
+
+
+def test_coverage_counts_only_exact():
+    assert header_coverage(["Предмет", "Время", "Преподаватель"]) == 1.0
+    assert header_coverage(["Предмет", "Время", "Преподаватели"]) < 1.0
+    assert header_coverage(["Предмет", "Время", "Преподаватель", "ФИО студента", "Место работы"]) < 1.0
+
+
+def test_unrelated_columns_keep_llm_fields():
+    prompt = (
+        "[Sheet: 1] [Header: ] row: Предмет=Матан | Время=09:00-10:30 | "
+        "Преподаватель=Иванов И.И. | ФИО студента=Петров П.П. | Место работы=Завод"
+    )
+    parsed = {"subject": "Матан", "teacher": "Иванов И.И.", "room": "101"}
+    lesson = normalize_parsed(_merge_row(prompt, parsed), prompt)
+    assert lesson["teacher"] == "Иванов И.И."
+    assert lesson["room"] == "101"
+    assert (lesson["start_time"], lesson["end_time"]) == ("09:00", "10:30")
+
+
+def test_fuzzy_column_does_not_override_exact_key():
+    prompt = "[Sheet: 1] [Header: ] row: Предмет=Матан | Аудитор=202"
+    merged = _merge_row(prompt, {"subject": "Матан", "start_time": "9:00", "room": "101"})
+    assert normalize_parsed(merged, prompt)["room"] == "101"
+    assert normalize_parsed_many([merged], [prompt]) == [normalize_parsed(merged, prompt)]
+    # без точного ключа нечёткая колонка заполняет поле
+    alone = _merge_row(prompt, {"subject": "Матан", "start_time": "9:00"})
+    assert normalize_parsed(alone, prompt)["room"] == "202"
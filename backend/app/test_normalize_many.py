@@ -0,0 +1,61 @@
+# backend/app/test_normalize_many.py
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+from backend.app.parsers import _merge_row, normalize_parsed, normalize_parsed_many
+
+# точные и нечёткие заголовки, ключи модели и мусор
+KEYS = [
+    "subject", "Предмет", "Дисциплина", "teacher", "Преподаватель:", "Преподаватели",
+    "room", "Ауд", "Аудитор", "time", "Время занят.", "start_time", "end_time",
+    "Начало пары", "weekday", "День", "week_type", "Тип нед.", "group", "subgroup",
+    "date", "note", "ФИО студента", "Место работы", "",
+]
+VALUES = [
+    "", " ", None, 0, 1.5, "Матан", "  Физика;", "Иванов И.И.", "101", "Б-202,",
+    "09:00-10:30", "9.00 - 10.30", "9:00", "10:30;", "25:99", "пн", "Вторник",
+    "чётная", "Нечётная неделя", "неч.", "1-16", "оба", "2024-09-02", "ПИ-21",
+    ["09:00", "10:30"], {"start_time": "09:00", "end_time": "10:30"},
+    {"начало": "8:30", "конец": "10:00"}, {"start_time": 900},
+]
+NOT_DICTS = [None, "", "строка", ["subject"], 42]
+
+
+def _random_dict(rnd: random.Random) -> dict:
+    return {rnd.choice(KEYS): rnd.choice(VALUES) for _ in range(rnd.randint(0, 8))}
+
+
+def _random_obj(rnd: random.Random):
+    if rnd.random() < 0.1:
+        return rnd.choice(NOT_DICTS)
+    return _random_dict(rnd)
+
+
+def _random_prompt(rnd: random.Random, i: int) -> str:
+    cells = [f"{rnd.choice(KEYS)}={rnd.choice(VALUES)}" for _ in range(rnd.randint(0, 5))]
+    return f"[Sheet: {i % 3}] [Header: ] row: " + " | ".join(cells)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_many_matches_single(seed):
+    rnd = random.Random(seed)
+    prompts = [_random_prompt(rnd, i) for i in range(300)]
+    objs = [_random_obj(rnd) for _ in prompts]
+    expected = [normalize_parsed(o, p) for o, p in zip(objs, prompts)]
+    assert normalize_parsed_many(objs, prompts) == expected
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_many_matches_single_after_merge(seed):
+    # как в _build_lessons: ответ модели + локальный разбор строки
+    rnd = random.Random(1000 + seed)
+    prompts = [_random_prompt(rnd, i) for i in range(300)]
+    merged = [_merge_row(p, _random_dict(rnd) if rnd.random() < 0.8 else None) for p in prompts]
+    expected = [normalize_parsed(m, p) for m, p in zip(merged, prompts)]
+    assert normalize_parsed_many(merged, prompts) == expected
@@ -0,0 +1,71 @@
+# backend/app/test_week_parity.py
+import sys
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+from backend.app import storage
+from backend.app.conflicts import detect_conflicts
+from backend.app.lesson_store import query_lessons, replace_schedule
+from backend.app.mappings import week_parity
+from backend.app.parsers import _normalize_week_type
+from backend.app.semester import iter_occurrences
+
+# 2024-09-02 — понедельник первой (нечётной) недели
+START = date(2024, 9, 2)
+EVEN_MONDAY = date(2024, 9, 9)
+ODD_MONDAY = date(2024, 9, 16)
+
+
+def _lesson(week_type: str, **extra) -> dict:
+    return {
+        "subject": "Матан", "start_time": "09:00", "end_time": "10:30",
+        "room": "101", "weekday": "пн", "week_type": week_type, "raw": "", **extra,
+    }
+
+
+@pytest.mark.parametrize("value, parity", [
+    ("четная", "четная"),
+    ("чётная", "четная"),
+    ("Чётная неделя", "четная"),
+    ("чет.", "четная"),
+    ("нечётная", "нечетная"),
+    ("Неч.", "нечетная"),
+    ("1-16", ""),
+    ("оба", ""),
+    (None, ""),
+])
+def test_week_parity(value, parity):
+    assert week_parity(value) == parity
+
+
+def test_normalize_folds_yo():
+    assert _normalize_week_type("Чётная неделя") == "четная"
+    assert _normalize_week_type("неч.") == "нечетная"
+    assert _normalize_week_type("1-16") == "1-16"
+
+
+def test_calendar_respects_yo_parity():
+    days = [occ["date"] for occ in iter_occurrences([({}, _lesson("чётная"))], START, date(2024, 9, 22))]
+    assert days == [EVEN_MONDAY.isoformat()]
+
+
+def test_conflicts_skip_opposite_parity():
+    lessons = [_lesson("чётная"), _lesson("Нечётная", subject="Физика")]
+    assert detect_conflicts(lessons)["conflicts"] == []
+    lessons[1]["week_type"] = "Чётная неделя"
+    assert len(detect_conflicts(lessons)["conflicts"]) == 1
+
+
+def test_date_filter_respects_yo_parity(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(storage, "_connections", {})
+    replace_schedule("s", [_lesson("чётная")])
+    for day, count in ((EVEN_MONDAY, 1), (ODD_MONDAY, 0)):
+        page = query_lessons({"date": day.isoformat(), "semester_start": START.isoformat()})
+        assert len(page["items"]) == count
+    assert len(query_lessons({"week_type": "четная"})["items"]) == 1